@@ -0,0 +1,148 @@
+"""Availability of volunteers as bitmasks.
+Each volunteer gets an index, the position in the persons
+given to BitsetAvailability.
+A set of persons is an int where bit <index> is set
+for each person in the set. Set operations are bitwise operations
+on the ints, e.g. union is '|' and difference is '& ~'.
+"""
+from datetime import timedelta
+
+
+class PersonMask:
+    """A set of person names stored as a mask. Supports the set
+    operations that the Scheduler uses on a pool of available persons.
+
+    Attributes:
+        mask: (int)
+            A bit for each person in the set.
+        bits: (dict)
+            key=(string) name, value = (int) the bit of the person.
+    """
+    def __init__(self, mask, bits):
+        self.mask = mask
+        self.bits = bits
+
+    def __contains__(self, name):
+        return bool(self.mask & self.bits.get(name, 0))
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def __bool__(self):
+        return bool(self.mask)
+
+    def difference_update(self, names):
+        for name in names:
+            self.mask &= ~self.bits.get(name, 0)
+
+
+class BitsetAvailability:
+    """The persons not available for the shifts of an agenda,
+    registered as bitmasks instead of sets of names.
+
+    Attributes:
+        names: (tuple)
+            Person names. The index of a name is the bit of the person.
+        bits: (dict)
+            key=(string) name, value = (int) the bit of the person.
+        service_masks: (dict)
+            key=(string) service, value = mask of the persons
+            with that service.
+        weekday_shift_masks: (dict)
+            key=((int) weekday, (int) shift), value = mask of
+            the persons who are not willing to work on the weekday and shift.
+        date_masks: (dict)
+            key=date_object, value = mask of the persons not available
+            on that date (NietInPeriode, and the day before and after a shift).
+        week_masks: (dict)
+            key=(int) weeknr, value = mask of the persons not available
+            in that week.
+    """
+    def __init__(self, persons):
+        self.names = tuple(p.name for p in persons)
+        self.bits = {name: 1 << index
+                     for index, name in enumerate(self.names)}
+        self.service_masks = {'verzorger': 0, 'algemeen': 0}
+        for p in persons:
+            self.service_masks[p.service] |= self.bits[p.name]
+        self.weekday_shift_masks = {}
+        self.date_masks = {}
+        self.week_masks = {}
+
+    def fork(self):
+        """Return a copy that can be changed without changing
+        this one. The masks are ints, so copying the dicts is enough.
+        """
+        fork = BitsetAvailability(())
+        fork.names = self.names
+        fork.bits = self.bits
+        fork.service_masks = self.service_masks
+        fork.weekday_shift_masks = self.weekday_shift_masks
+        fork.date_masks = dict(self.date_masks)
+        fork.week_masks = dict(self.week_masks)
+        return fork
+
+    def mask(self, names):
+        """Return the mask of the person names in <names>.
+        Unknown names (like "" for an empty shift) are ignored.
+        """
+        result = 0
+        for name in names:
+            result |= self.bits.get(name, 0)
+        return result
+
+    def pool(self, mask):
+        """Return <mask> as a PersonMask.
+        """
+        return PersonMask(mask, self.bits)
+
+    def to_names(self, mask):
+        """Return the set of person names in <mask>.
+        """
+        result = set()
+        while mask:
+            lowest = mask & -mask
+            result.add(self.names[lowest.bit_length() - 1])
+            mask ^= lowest
+        return result
+
+    def apply_static_rules(self, persons, agenda):
+        """Register the not_on_shifts_per_weekday and
+        not_in_timespan of <persons> for the dates of <agenda>.
+        """
+        for person in persons:
+            bit = self.bits[person.name]
+            for weekday, shifts in person.not_on_shifts_per_weekday.items():
+                for shift in shifts:
+                    key = (weekday, shift)
+                    self.weekday_shift_masks[key] = (
+                        self.weekday_shift_masks.get(key, 0) | bit)
+            for timespan in person.not_in_timespan:
+                for ag_item in agenda.searchitems(timespan=timespan):
+                    self.block_date(ag_item.date, bit)
+
+    def block_date(self, date, mask):
+        """Make the persons in <mask> not available on <date>.
+        """
+        self.date_masks[date] = self.date_masks.get(date, 0) | mask
+
+    def block_day_and_next_day(self, date, mask):
+        """Make the persons in <mask> not available on <date>
+        and on the day after <date>.
+        """
+        self.block_date(date, mask)
+        self.block_date(date + timedelta(days=1), mask)
+
+    def block_week(self, weeknr, mask):
+        """Make the persons in <mask> not available in week <weeknr>.
+        """
+        self.week_masks[weeknr] = self.week_masks.get(weeknr, 0) | mask
+
+    def not_available(self, agenda_item):
+        """Return the mask of the persons not available
+        for <agenda_item>.
+        """
+        weekday_shift = (agenda_item.weekday, agenda_item.shift)
+        return (self.weekday_shift_masks.get(weekday_shift, 0)
+                | self.date_masks.get(agenda_item.date, 0)
+                | self.week_masks.get(agenda_item.weeknr, 0))
@@ -0,0 +1,202 @@
+"""Schedule several rosters in one run, e.g. of several locations
+or test variants. The jobs are listed in a manifest and are
+scheduled at the same time in a pool of processes, so the time
+of a batch depends on the number of cores, not on the number of jobs.
+
+A manifest is a csv file (delimiter const.CSV_DELIMITER) with
+a job per line:
+    sourcefile;year;quarter;version
+A sourcefile is relative to the directory of the manifest.
+Empty lines and lines starting with '#' are skipped.
+
+Each sourcefile is read once, also if it is in more than one job,
+and the holydays of a year are calculated once per process.
+Each job writes its own files (see hospiceplanner.schedule_quarter()),
+with the name of the sourcefile in the filename, e.g.
+    hospice rijssen 2e kwartaal 2023 v. 1.csv
+
+Example:
+    python batch.py jobs.csv -f csv xlsx
+"""
+import argparse
+from collections import namedtuple
+from concurrent.futures import as_completed
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+import csv
+import io
+from pathlib import Path
+import time
+
+import const
+import exceptions
+import hospiceplanner
+import init_volunteers
+
+# A line of the manifest.
+#   sourcefile: (string) the sourcefile of the volunteers
+#   year, quarter, version: (int) see Scheduler
+Job = namedtuple('Job', ('sourcefile', 'year', 'quarter', 'version'))
+
+# The result of a job.
+#   job: (Job)
+#   seconds: (float) the time of the job, None if the job failed
+#   score: (Score) of the schedule, None if the job failed
+#   output: (string) what the planner printed for the job
+#   error: the exception if the job failed, otherwise None
+JobResult = namedtuple('JobResult', (
+    'job', 'seconds', 'score', 'output', 'error'))
+
+
+def outfilename(job):
+    """Return the name of the output files of <job>, without extension.
+    """
+    return (f'./hospice {Path(job.sourcefile).stem} {job.quarter}e '
+            f'kwartaal {job.year} v. {job.version}')
+
+
+def job_label(job):
+    """Return <job> as e.g. 'rijssen.xlsx 2e kwartaal 2023 v. 1'.
+    """
+    return (f'{Path(job.sourcefile).name} {job.quarter}e kwartaal '
+            f'{job.year} v. {job.version}')
+
+
+def read_manifest(filename):
+    """Return the list of Job in the manifest <filename>.
+    """
+    directory = Path(filename).parent
+    jobs = []
+    outfilenames = set()
+    with open(filename, newline='', encoding='UTF-8') as f:
+        reader = csv.reader(f, delimiter=const.CSV_DELIMITER)
+        for line_num, row in enumerate(reader, 1):
+            if not ''.join(row).strip() or row[0].lstrip().startswith('#'):
+                continue
+            text = const.CSV_DELIMITER.join(row)
+            if len(row) != 4:
+                raise exceptions.ManifestError(
+                    f'Verwacht bronbestand;jaar;kwartaal;versie, '
+                    f'regel: {line_num}, tekst: {text!r}')
+            sourcefile, year, quarter, version = (
+                value.strip() for value in row)
+            try:
+                job = Job(str(directory / sourcefile),
+                          int(year), int(quarter), int(version))
+            except ValueError:
+                raise exceptions.ManifestError(
+                    f'Jaar, kwartaal en versie moeten getallen zijn, '
+                    f'regel: {line_num}, tekst: {text!r}') from None
+            if not 1 <= job.quarter <= 4:
+                raise exceptions.ManifestError(
+                    f'Kwartaal moet 1 t/m 4 zijn, '
+                    f'regel: {line_num}, tekst: {text!r}')
+            if outfilename(job) in outfilenames:
+                raise exceptions.ManifestError(
+                    f'Dezelfde planning staat al eerder in het bestand, '
+                    f'regel: {line_num}, tekst: {text!r}')
+            outfilenames.add(outfilename(job))
+            jobs.append(job)
+    return jobs
+
+
+def load_volunteers(jobs, use_cache=True):
+    """Read each sourcefile of <jobs> once.
+    Return a dict of key=sourcefile, value = Volunteers,
+    or the exception if the sourcefile could not be read.
+    """
+    volunteers = {}
+    for job in jobs:
+        if job.sourcefile not in volunteers:
+            try:
+                volunteers[job.sourcefile] = init_volunteers.Volunteers(
+                    job.sourcefile, use_cache=use_cache)
+            except Exception as e:
+                volunteers[job.sourcefile] = e
+    return volunteers
+
+
+def run_job(job, volunteers, args):
+    """Schedule <job> for <volunteers> with the options in <args>
+    (see hospiceplanner.add_schedule_options()).
+    Return the JobResult. What the planner prints is in the
+    JobResult, so the output of jobs in parallel is not mixed.
+    Note: scheduling changes the counters of the persons in <volunteers>,
+    so each job needs its own copy (as it gets in a worker process).
+    """
+    job_args = argparse.Namespace(**vars(args))
+    job_args.version = job.version
+    output = io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(output):
+        scheduler = hospiceplanner.schedule_quarter(
+            job_args, job.year, job.quarter, volunteers,
+            outfilename=outfilename(job))
+    return JobResult(job, time.perf_counter() - start, scheduler.score(),
+                     output.getvalue(), None)
+
+
+def run_jobs(jobs, volunteers, args, max_workers=None):
+    """Schedule <jobs> in a pool of <max_workers> processes
+    (default: the number of cores). <volunteers> is the result
+    of load_volunteers(). Yield the JobResult of each job
+    as soon as it is ready. A job that fails doesn't stop the others.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for job in jobs:
+            job_volunteers = volunteers[job.sourcefile]
+            if isinstance(job_volunteers, Exception):
+                # The sourcefile could not be read
+                yield JobResult(job, None, None, '', job_volunteers)
+            else:
+                futures[executor.submit(
+                    run_job, job, job_volunteers, args)] = job
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                yield JobResult(futures[future], None, None, '', e)
+
+
+def report_lines(jobs, results, seconds):
+    """Yield the lines of the report of <results> of <jobs>,
+    in the order of <jobs>, and the total time <seconds>.
+    """
+    result_of_job = {result.job: result for result in results}
+    yield f'{len(jobs)} planningen in {seconds:.2f} s:'
+    for job in jobs:
+        result = result_of_job[job]
+        if result.error is not None:
+            yield f'  {job_label(job)}: MISLUKT: {result.error}'
+        else:
+            yield (f'  {job_label(job)}: {result.seconds:.2f} s, ongeplande '
+                   f'diensten: {result.score.unscheduled_shifts}')
+
+
+def main(args):
+    jobs = read_manifest(args.manifest)
+    hospiceplanner.draw_seed(args)
+    start = time.perf_counter()
+    volunteers = load_volunteers(jobs, use_cache=not args.no_cache)
+    results = []
+    for result in run_jobs(jobs, volunteers, args, args.workers):
+        print(f'\n--- {job_label(result.job)}')
+        print(result.output, end='')
+        results.append(result)
+    print()
+    for line in report_lines(jobs, results, time.perf_counter() - start):
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Planningen voor meerdere bestanden tegelijk')
+    parser.add_argument('manifest',
+        help='.csv bestand met een planning per regel: '
+             'bronbestand;jaar;kwartaal;versie')
+    parser.add_argument('-w', '--workers',
+        help='aantal processen (standaard: het aantal cores)',
+        type=int, default=None)
+    hospiceplanner.add_schedule_options(parser)
+    main(parser.parse_args())
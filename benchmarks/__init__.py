@@ -0,0 +1,7 @@
+"""Benchmarks for the scheduling pipeline of hospiceplanner.
+
+generate.py makes a sourcefile with synthetic volunteers,
+run.py times each stage of the pipeline and writes the results as JSON.
+Run from the root of the repository, e.g.:
+    python -m benchmarks.run --sizes 50 500 5000 --output bench.json
+"""
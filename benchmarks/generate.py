@@ -0,0 +1,107 @@
+"""Generate a sourcefile (.xlsx) with synthetic volunteers.
+The columns and their values follow the format that
+Volunteers._read_volunteersfile() accepts.
+"""
+import argparse
+from datetime import timedelta
+import random
+
+from openpyxl import Workbook
+
+import const
+import init_agenda
+
+HEADERS = ('Service', 'Achternaam', 'Voornaam', 'Tussenv', 'Actief',
+           'DienstenPerAantalWeken', 'NietOpDagEnDienst',
+           'VoorkeurDagEnDienst', 'NietInPeriode', 'VoorkeurTekst',
+           'NietSamenMet')
+
+# Volunteers._read_volunteersfile() starts reading in column 10
+FIRST_COLUMN = 10
+
+SHIFTS_PER_WEEKS = ('1,1', '1,2', '2,1', '3,2', '2,3')
+GIVENNAMES = ('Anna', 'Bram', 'Carla', 'Dirk', 'Els', 'Frank', 'Gerda',
+              'Hans', 'Ineke', 'Jan', 'Karin', 'Luuk', 'Marijke', 'Niels')
+INSERTS = ('', '', '', 'van', 'de', 'van der', 'ter')
+
+
+def _day_and_shifts(rng, max_days):
+    """Return a string like 'ma:1,2#wo:3#' with at most <max_days> days.
+    """
+    result = ''
+    weekdays = rng.sample(sorted(const.WEEKDAY_LOOKUP), 
+                          rng.randint(0, max_days))
+    for weekday in weekdays:
+        shifts = sorted(rng.sample(range(1, 5), rng.randint(1, 4)))
+        result += weekday + ':' + ','.join(map(str, shifts)) + '#'
+    return result
+
+
+def _timespans(rng, startday, endday, max_count):
+    """Return a string like '2-4-2023, 10-4-2023>21-4-2023'
+    with dates between <startday> and <endday>.
+    """
+    days = (endday - startday).days
+    result = []
+    for _ in range(rng.randint(0, max_count)):
+        first = startday + timedelta(days=rng.randint(0, days))
+        item = f'{first.day}-{first.month}-{first.year}'
+        if rng.random() < 0.5:
+            last = first + timedelta(days=rng.randint(1, 21))
+            item += f'>{last.day}-{last.month}-{last.year}'
+        result.append(item)
+    return ', '.join(result)
+
+
+def generate_rows(size, year, quarter, seed=0):
+    """Return a list of <size> rows (tuples in the order of HEADERS)
+    with synthetic volunteers for <year> and <quarter>.
+    About half of them are caretakers, one in five has a preference.
+    """
+    rng = random.Random(seed)
+    agenda = init_agenda.Agenda(year=year, quarter=quarter)
+    startday = agenda.items[0].date
+    endday = agenda.items[-1].date
+    rows = []
+    for number in range(1, size + 1):
+        preference = ''
+        if rng.random() < 0.2:
+            preference = _day_and_shifts(rng, 2)
+        rows.append((
+            rng.choice(('verzorger', 'algemeen')),
+            f'Vrijwilliger{number}',
+            rng.choice(GIVENNAMES),
+            rng.choice(INSERTS) or None,
+            'x',
+            rng.choice(SHIFTS_PER_WEEKS),
+            _day_and_shifts(rng, 3) or None,
+            preference or None,
+            _timespans(rng, startday, endday, 2) or None,
+            None,
+            None))
+    return rows
+
+
+def write_workbook(rows, filename):
+    """Write HEADERS and <rows> to the .xlsx file <filename>.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    padding = (None,) * (FIRST_COLUMN - 1)
+    ws.append(padding + HEADERS)
+    for row in rows:
+        ws.append(padding + row)
+    wb.save(filename)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Maak een bestand met synthetische vrijwilligers')
+    parser.add_argument('size', help='aantal vrijwilligers', type=int)
+    parser.add_argument('filename', help='.xlsx bestand')
+    parser.add_argument('--year', type=int, default=2023)
+    parser.add_argument('--quarter', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_workbook(generate_rows(args.size, args.year, args.quarter, 
+                                 args.seed), args.filename)
@@ -0,0 +1,165 @@
+"""Time each stage of the scheduling pipeline for
+synthetic populations of volunteers, and write the results as JSON.
+
+The stages are:
+    load_volunteers: read and check the sourcefile (Volunteers)
+    load_volunteers_cached: read the persons from the cache
+    init_agenda: make the agenda of the quarter (Agenda)
+    feasibility_check: feasibility.check()
+    apply_static_rules: Scheduler._apply_static_rules()
+    schedule_volunteers: Scheduler.schedule_volunteers()
+    fork: Scheduler.fork() of the scheduled agenda
+    write_csv, write_txt, write_xlsx: write the agenda to the output files
+    export_all: write all formats of export.RENDERERS in one pass
+"""
+import argparse
+from contextlib import contextmanager
+from contextlib import redirect_stdout
+import io
+import json
+import os
+from pathlib import Path
+import platform
+import tempfile
+import time
+
+import const
+import export
+import feasibility
+import holyday
+import hospiceplanner
+import init_agenda
+import init_volunteers
+from benchmarks import generate
+
+
+@contextmanager
+def _timer(timings, stage):
+    """Add the seconds of the with-block to timings[stage].
+    """
+    start = time.perf_counter()
+    yield
+    timings[stage] = time.perf_counter() - start
+
+
+def _timed_scheduler(engine, timings):
+    """Return a subclass of the Scheduler of <engine> that
+    times _apply_static_rules(), which is called in __init__().
+    """
+    scheduler_class = hospiceplanner.SCHEDULERS[engine]
+
+    class TimedScheduler(scheduler_class):
+        def _apply_static_rules(self):
+            with _timer(timings, 'apply_static_rules'):
+                super()._apply_static_rules()
+
+    return TimedScheduler
+
+
+def run_pipeline(filename, year, quarter, engine='sets', seed=0,
+                 outdir='.'):
+    """Run the pipeline once for the sourcefile <filename>.
+    Return a dict with the seconds per stage and the Score.
+    """
+    timings = {}
+    # The pipeline reports to stdout, which is not part of the benchmark.
+    with redirect_stdout(io.StringIO()):
+        with _timer(timings, 'load_volunteers'):
+            volunteers = init_volunteers.Volunteers(filename, 
+                                                    use_cache=False)
+        # Fill the cache, then time reading from it
+        init_volunteers.Volunteers(filename)
+        with _timer(timings, 'load_volunteers_cached'):
+            init_volunteers.Volunteers(filename)
+        with _timer(timings, 'init_agenda'):
+            agenda = init_agenda.Agenda(year=year, quarter=quarter)
+        with _timer(timings, 'feasibility_check'):
+            feasibility.check(agenda, volunteers,
+                              holyday.determine_holydays(year))
+        scheduler = _timed_scheduler(engine, timings)(
+            year, quarter, 1, agenda, volunteers, seed=seed)
+        with _timer(timings, 'schedule_volunteers'):
+            scheduler.schedule_volunteers()
+        with _timer(timings, 'fork'):
+            scheduler.fork()
+        outfilename = os.path.join(outdir, 'benchmark')
+        with _timer(timings, 'write_csv'):
+            scheduler.write_agenda_to_csv_file(outfilename + '.csv')
+        with _timer(timings, 'write_txt'):
+            scheduler.write_agenda_to_txt_file(outfilename + '.txt')
+        with _timer(timings, 'write_xlsx'):
+            scheduler.write_agenda_to_xlsx_file(outfilename + '.xlsx')
+        with _timer(timings, 'export_all'):
+            export.export_agenda(scheduler, [
+                renderer(f'{outfilename}.{extension}')
+                for extension, renderer in export.RENDERERS.items()])
+    return {'stages': timings, 'score': scheduler.score()._asdict()}
+
+
+def _run_size(size, year, quarter, engine, seed, repeat, tmpdir):
+    """Generate a sourcefile with <size> volunteers and run
+    the pipeline <repeat> times. The fastest time of each stage is kept.
+    """
+    filename = os.path.join(tmpdir, f'vrijwilligers-{size}.xlsx')
+    generate.write_workbook(
+        generate.generate_rows(size, year, quarter, seed), filename)
+    runs = [run_pipeline(filename, year, quarter, engine, seed, tmpdir)
+            for _ in range(repeat)]
+    stages = {stage: min(run['stages'][stage] for run in runs)
+              for stage in runs[0]['stages']}
+    return {
+        'size': size,
+        'stages': stages,
+        'total': sum(stages.values()),
+        'score': runs[0]['score']}
+
+
+def run_benchmarks(sizes, year, quarter, engine='sets', seed=0, repeat=1):
+    """Generate a sourcefile for each size in <sizes> and run
+    the pipeline <repeat> times. The fastest time of each stage is kept.
+    Return the results as a dict.
+    """
+    results = []
+    cache_dir = const.CACHE_DIR
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Don't fill the cache of the user with synthetic volunteers
+        const.CACHE_DIR = tmpdir
+        try:
+            for size in sizes:
+                results.append(_run_size(size, year, quarter, engine, seed,
+                                         repeat, tmpdir))
+        finally:
+            const.CACHE_DIR = cache_dir
+    return {
+        'version': hospiceplanner.__version__,
+        'python': platform.python_version(),
+        'engine': engine,
+        'year': year,
+        'quarter': quarter,
+        'seed': seed,
+        'repeat': repeat,
+        'results': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Meet de tijd van elke stap van de planner')
+    parser.add_argument('--sizes', help='aantallen vrijwilligers',
+        type=int, nargs='+', default=[50, 500, 5000])
+    parser.add_argument('--year', type=int, default=2023)
+    parser.add_argument('--quarter', type=int, default=2)
+    parser.add_argument('--engine', choices=hospiceplanner.SCHEDULERS.keys(),
+        default='sets')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', help='aantal keren per aantal',
+        type=int, default=1)
+    parser.add_argument('--output', help='.json bestand (standaard: stdout)')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, args.year, args.quarter,
+                            args.engine, args.seed, args.repeat)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n')
+    else:
+        print(text)
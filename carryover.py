@@ -0,0 +1,85 @@
+"""The state of the volunteers at the end of a scheduled quarter,
+to continue with the next quarter where the last one stopped
+(see Scheduler.quarter_state() and Scheduler.carry_over()).
+
+Without it, the scheduler of the next quarter knows nothing of
+the former planning: a person with a shift on the last day of
+the quarter could be scheduled on the first day of the new quarter,
+and the weekly and weekend counters would start from scratch.
+
+The state is saved as a small json file, so a quarter can be
+scheduled in a later run without scheduling the quarters before it.
+"""
+from collections import namedtuple
+from datetime import date as Date
+import json
+
+# The state of one person at the end of a quarter.
+#   availability_counter, weekend_counter: (int) see init_volunteers.Person
+#   last_shift_date: date_object of the last shift, or None
+#   not_available_until: date_object of the last day in the next quarter
+#       on which the person is not available (see shifts_per_weeks),
+#       or None
+PersonState = namedtuple('PersonState', (
+    'availability_counter', 'weekend_counter',
+    'last_shift_date', 'not_available_until'))
+
+# The state of all persons at the end of a quarter.
+#   year, quarter: (int) the scheduled quarter
+#   last_date: date_object of the last day of the agenda
+#   persons: dict of key=(string) name, value = PersonState
+QuarterState = namedtuple('QuarterState', (
+    'year', 'quarter', 'last_date', 'persons'))
+
+
+def _to_date(text):
+    return Date.fromisoformat(text) if text else None
+
+
+def _to_text(date):
+    return date.isoformat() if date else None
+
+
+def save(state, filename):
+    """Write the QuarterState <state> to the json file <filename>.
+    Each person is a list of the values of PersonState.
+    """
+    data = {
+        'year': state.year,
+        'quarter': state.quarter,
+        'last_date': _to_text(state.last_date),
+        'persons': {
+            name: [person.availability_counter, person.weekend_counter,
+                   _to_text(person.last_shift_date),
+                   _to_text(person.not_available_until)]
+            for name, person in state.persons.items()}}
+    with open(filename, 'w', encoding='UTF-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    print(f'Bestand opgeslagen: {filename}')
+
+
+def load(filename):
+    """Return the QuarterState in the json file <filename>.
+    """
+    with open(filename, encoding='UTF-8') as f:
+        data = json.load(f)
+    return QuarterState(
+        year=data['year'],
+        quarter=data['quarter'],
+        last_date=_to_date(data['last_date']),
+        persons={
+            name: PersonState(availability_counter, weekend_counter,
+                              _to_date(last_shift_date),
+                              _to_date(not_available_until))
+            for name, (availability_counter, weekend_counter,
+                       last_shift_date, not_available_until)
+            in data['persons'].items()})
+
+
+def next_quarters(year, quarter, count):
+    """Yield (year, quarter) for <count> quarters,
+    starting with <year> <quarter>.
+    """
+    for _ in range(count):
+        yield year, quarter
+        year, quarter = (year + 1, 1) if quarter == 4 else (year, quarter + 1)
@@ -11,6 +11,9 @@ PERSONS_ALWAYS_IN_WEEKEND = ('Marijke Tibben', 'Janny Seppenwoolde')
 
 DATEFORMAT = '%d-%m-%Y'
 
+# Directory for the persons read from a sourcefile, see init_volunteers.py
+CACHE_DIR = '~/.cache/hospiceplanner'
+
 # Needed when reporting shifts
 SHIFTNUMBER_LABEL_LOOKUP = {
     1: "7-11 uur",
@@ -73,3 +73,42 @@ class InvalidSourceFileError(Exception):
 class MissingCaseValueError(RuntimeError):
     """Statement 'Case' cold not intepret value
     """
+
+
+class SolverError(RuntimeError):
+    """Exception raised if the solver found no schedule.
+    """
+
+
+class SourcefileErrors(Exception):
+    """Exception raised if the sourcefile has more than one error.
+    All errors are in the attribute 'errors'.
+    """
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(
+            f'{len(errors)} fouten in het bronbestand:\n'
+            + '\n'.join(str(error) for error in errors))
+
+
+class QuarterStateError(Exception):
+    """Exception raised if the state of a quarter doesn't fit
+    the quarter that is scheduled.
+    """
+
+
+class UnknownPersonnameError(Exception):
+    """Exception raised if a person name is not in the volunteers.
+    """
+
+
+class SnapshotError(Exception):
+    """Exception raised if a file is not a saved schedule,
+    or doesn't fit the agenda of its quarter.
+    """
+
+
+class ManifestError(Exception):
+    """Exception raised if a line of a manifest of jobs
+    has the wrong format (see batch.py).
+    """
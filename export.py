@@ -0,0 +1,377 @@
+"""Export a scheduled agenda in one or more formats at once.
+export_agenda() groups the agenda items per week, per day and
+per shift in one pass over the agenda, and hands each week
+to all renderers. A renderer writes one format:
+    CsvRenderer: the csv file for the planners
+    TxtRenderer: a line per shift
+    XlsxRenderer: the layout of the csv file in a workbook
+    JsonRenderer: the shifts as json objects
+    IcalRenderer: the shifts as events of an iCalendar (.ics) file
+
+A new format is a subclass of Renderer, see Renderer.
+"""
+from collections import namedtuple
+import csv
+from datetime import datetime
+from datetime import timezone
+import json
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.styles import PatternFill
+from openpyxl.worksheet.pagebreak import Break
+
+import const
+
+WEEKDAY_NAMES = ("maandag", "dinsdag", "woensdag", "donderdag",
+                 "vrijdag", "zaterdag", "zondag")
+
+# The agenda items of one week.
+#   weeknr: (int)
+#   days: list of (date_object, list of the agenda items of the day)
+#   shifts: dict of key=(int) shift, value = list of the agenda items
+#       of the shift, one per day
+Week = namedtuple('Week', ('weeknr', 'days', 'shifts'))
+
+
+def weeks(agenda):
+    """Yield a Week for each week of <agenda>,
+    in one pass over the agenda items.
+    """
+    week = None
+    for ag_item in agenda.items:
+        if week is None or ag_item.weeknr != week.weeknr:
+            if week is not None:
+                yield week
+            week = Week(ag_item.weeknr, [], {})
+        if not week.days or week.days[-1][0] != ag_item.date:
+            week.days.append((ag_item.date, []))
+        week.days[-1][1].append(ag_item)
+        week.shifts.setdefault(ag_item.shift, []).append(ag_item)
+    if week is not None:
+        yield week
+
+
+def export_agenda(scheduler, renderers):
+    """Write the agenda of <scheduler> with each of the <renderers>.
+    The agenda is grouped once for all renderers.
+    """
+    for renderer in renderers:
+        renderer.start(scheduler)
+    try:
+        for week in weeks(scheduler.agenda):
+            for renderer in renderers:
+                renderer.week(week)
+    except BaseException:
+        for renderer in renderers:
+            renderer.close()
+        raise
+    for renderer in renderers:
+        renderer.end()
+
+
+def not_available(person):
+    """if a shift has no volunteer,
+    fill the cell with 'not available'.
+    """
+    return '#N/A' if person == "" else person
+
+
+class Renderer:
+    """A format of the exported agenda.
+    export_agenda() calls start() once, then week() for each week
+    of the agenda and then end() once, or close() after an error.
+    """
+    def start(self, scheduler):
+        pass
+
+    def week(self, week):
+        pass
+
+    def end(self):
+        self.close()
+
+    def close(self):
+        pass
+
+
+class FileRenderer(Renderer):
+    """A Renderer that writes a text file <filename>.
+    """
+    # The newline argument of open()
+    newline = None
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = None
+
+    def start(self, scheduler):
+        self.file = open(self.filename, mode='w', encoding='UTF-8',
+                         newline=self.newline)
+
+    def end(self):
+        self.close()
+        print(f'Bestand opgeslagen: {self.filename}')
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+
+class CsvRenderer(FileRenderer):
+    """The agenda for the planners: a block per week with
+    a row of caretakers and a row of generalists per shift.
+    After every two weeks there is a row "pagebreak".
+    """
+    dateformat = "%-d %b"  # day - short monthname
+
+    def start(self, scheduler):
+        super().start(scheduler)
+        self.writer = csv.writer(self.file, delimiter=const.CSV_DELIMITER,
+            quotechar='"', quoting=csv.QUOTE_ALL)
+        row = (f"Hospice planning {str(scheduler.quarter)}e kwartaal "
+               f'{str(scheduler.year)}, versie {str(scheduler.version)}')
+        self.writer.writerow([row])
+        self.writer.writerow([])
+        self.week_index = 0
+
+    def week(self, week):
+        writer = self.writer
+        # Pagebreak after every two weeks
+        if self.week_index > 1 and not (self.week_index % 2):
+            writer.writerow(["pagebreak"])
+        self.week_index += 1
+
+        writer.writerow(["", "", "", "", "WEEK " + str(week.weeknr)])
+        writer.writerow([])
+        writer.writerow([""] + list(WEEKDAY_NAMES))
+        # row with dates, below 'week' indication
+        writer.writerow(["dienst"] + [
+            datetime.strftime(date, self.dateformat)
+            for date, _ in week.days])
+
+        # A row for each shift, with the names of
+        # 7 caretakers and 7 general service persons
+        for shift, ag_items in week.shifts.items():
+            writer.writerow([const.SHIFTNUMBER_LABEL_LOOKUP[shift]]
+                            + [not_available(i.persons[0]) for i in ag_items])
+            writer.writerow([""]
+                            + [not_available(i.persons[1]) for i in ag_items])
+            writer.writerow([])
+
+
+class TxtRenderer(FileRenderer):
+    """A line per shift, with a line between the weeks.
+    """
+    def start(self, scheduler):
+        super().start(scheduler)
+        self.first_week = True
+
+    def week(self, week):
+        if not self.first_week:
+            self.file.write('-' * 80 + '\n')  # Draw a line at a new week
+        self.first_week = False
+        for date, ag_items in week.days:
+            self.file.write('\n')
+            for item in ag_items:
+                weekdayname = const.WEEKDAY_NAME_LOOKUP[item.weekday]
+                self.file.write(
+                    f'{item.date} wn:{item.weeknr:>2} {weekdayname} '
+                    f'sh:{item.shift} {item.persons}\n')
+
+
+class JsonRenderer(FileRenderer):
+    """The shifts as a list of json objects. The objects are written
+    one at a time, not collected in memory.
+    """
+    def start(self, scheduler):
+        super().start(scheduler)
+        self.file.write(
+            f'{{"year": {scheduler.year}, "quarter": {scheduler.quarter}, '
+            f'"version": {json.dumps(scheduler.version)}, "shifts": [')
+        self.separator = '\n'
+
+    def week(self, week):
+        for _, ag_items in week.days:
+            for item in ag_items:
+                self.file.write(self.separator + json.dumps({
+                    'date': item.date.isoformat(),
+                    'weeknr': item.weeknr,
+                    'weekday': item.weekday,
+                    'shift': item.shift,
+                    'verzorger': item.persons[0],
+                    'algemeen': item.persons[1]}))
+                self.separator = ',\n'
+
+    def end(self):
+        self.file.write('\n]}\n')
+        super().end()
+
+
+class IcalRenderer(FileRenderer):
+    """The shifts with a volunteer as events of an iCalendar file,
+    for all volunteers or for the volunteer <name> only.
+    The times are those of const.SHIFTNUMBER_LABEL_LOOKUP,
+    in local time.
+    """
+    # The lines end with '\r\n' on all systems
+    newline = ''
+
+    def __init__(self, filename, name=None):
+        super().__init__(filename)
+        self.name = name
+
+    def _write(self, line):
+        # Lines are folded at 75 characters (RFC 5545)
+        while len(line) > 75:
+            self.file.write(line[:75] + '\r\n')
+            line = ' ' + line[75:]
+        self.file.write(line + '\r\n')
+
+    @staticmethod
+    def _text(value):
+        for character in ('\\', ';', ','):
+            value = value.replace(character, '\\' + character)
+        return value.replace('\n', '\\n')
+
+    @staticmethod
+    def _hours(shift):
+        # e.g. "7-11 uur" is (7, 11)
+        hours = const.SHIFTNUMBER_LABEL_LOOKUP[shift].split()[0]
+        start, end = hours.split('-')
+        return int(start), int(end)
+
+    def start(self, scheduler):
+        super().start(scheduler)
+        self.stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        for line in ('BEGIN:VCALENDAR', 'VERSION:2.0',
+                     'PRODID:-//hospiceplanner//NL', 'CALSCALE:GREGORIAN'):
+            self._write(line)
+
+    def week(self, week):
+        for _, ag_items in week.days:
+            for item in ag_items:
+                caretaker, generalist = item.persons
+                if self.name:
+                    if self.name not in item.persons:
+                        continue
+                elif not (caretaker or generalist):
+                    continue
+                start, end = self._hours(item.shift)
+                day = item.date.strftime('%Y%m%d')
+                self._write('BEGIN:VEVENT')
+                uid = (self.name or "hospice").replace(" ", "-")
+                self._write(f'UID:{day}-{item.shift}-{self._text(uid)}'
+                            f'@hospiceplanner')
+                self._write(f'DTSTAMP:{self.stamp}')
+                self._write(f'DTSTART:{day}T{start:02}0000')
+                self._write(f'DTEND:{day}T{end:02}0000')
+                self._write('SUMMARY:' + self._text(
+                    f'Hospice {const.SHIFTNUMBER_LABEL_LOOKUP[item.shift]}'))
+                self._write('DESCRIPTION:' + self._text(
+                    f'verzorger: {not_available(caretaker)}\n'
+                    f'algemeen: {not_available(generalist)}'))
+                self._write('END:VEVENT')
+
+    def end(self):
+        self._write('END:VCALENDAR')
+        super().end()
+
+
+class XlsxRenderer(Renderer):
+    """The layout of CsvRenderer in a sheet of a workbook:
+    a real page break after every two weeks,
+    and a shift without a volunteer is '#N/A' in red.
+    The sheet is added to the write-only <workbook> if given,
+    otherwise the workbook is saved as <filename>.
+    A write-only workbook streams the rows to disk,
+    so many agendas fit in one workbook.
+    """
+    dateformat = "%-d %b"  # day - short monthname
+    bold = Font(bold=True)
+    not_available_font = Font(bold=True, color='9C0006')
+    not_available_fill = PatternFill('solid', fgColor='FFC7CE')
+
+    def __init__(self, filename=None, workbook=None):
+        self.filename = filename
+        self.workbook = workbook
+
+    def _cell(self, value, font=None):
+        cell = WriteOnlyCell(self.ws, value)
+        if font:
+            cell.font = font
+        return cell
+
+    def _person_cell(self, person):
+        if person:
+            return self._cell(person)
+        cell = self._cell(not_available(person), self.not_available_font)
+        cell.fill = self.not_available_fill
+        return cell
+
+    def _append(self, row):
+        self.ws.append(row)
+        self.rows += 1
+
+    def start(self, scheduler):
+        self.saves = self.workbook is None
+        if self.saves:
+            self.workbook = Workbook(write_only=True)
+        self.ws = ws = self.workbook.create_sheet(
+            f'{scheduler.quarter}e kwartaal {scheduler.year}')
+        # Print a week block on the width of a page
+        ws.page_setup.orientation = 'landscape'
+        ws.page_setup.fitToWidth = 1
+        ws.page_setup.fitToHeight = 0
+        ws.sheet_properties.pageSetUpPr.fitToPage = True
+        ws.column_dimensions['A'].width = 12
+        for column in 'BCDEFGH':
+            ws.column_dimensions[column].width = 22
+
+        self.rows = 0
+        self._append([self._cell(
+            f"Hospice planning {scheduler.quarter}e kwartaal "
+            f'{scheduler.year}, versie {scheduler.version}',
+            Font(bold=True, size=14))])
+        self._append([])
+        self.week_index = 0
+
+    def week(self, week):
+        # Pagebreak after every two weeks
+        if self.week_index > 1 and not (self.week_index % 2):
+            self.ws.row_breaks.append(Break(id=self.rows))
+        self.week_index += 1
+
+        bold = self.bold
+        self._append(["", "", "", "",
+                      self._cell("WEEK " + str(week.weeknr), bold)])
+        self._append([])
+        self._append([""] + [self._cell(weekday, bold)
+                             for weekday in WEEKDAY_NAMES])
+        # row with dates, below 'week' indication
+        self._append([self._cell("dienst", bold)] + [
+            datetime.strftime(date, self.dateformat)
+            for date, _ in week.days])
+        for shift, ag_items in week.shifts.items():
+            self._append(
+                [self._cell(const.SHIFTNUMBER_LABEL_LOOKUP[shift], bold)]
+                + [self._person_cell(i.persons[0]) for i in ag_items])
+            self._append(
+                [""] + [self._person_cell(i.persons[1]) for i in ag_items])
+            self._append([])
+
+    def end(self):
+        if self.saves:
+            self.workbook.save(self.filename)
+            print(f'Bestand opgeslagen: {self.filename}')
+
+
+# key=format name, value = Renderer class, see export_agenda()
+RENDERERS = {
+    'txt': TxtRenderer,
+    'csv': CsvRenderer,
+    'xlsx': XlsxRenderer,
+    'json': JsonRenderer,
+    'ics': IcalRenderer,
+}
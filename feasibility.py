@@ -0,0 +1,365 @@
+"""Check before scheduling how many shifts can not be filled
+with the volunteers, whatever the schedule.
+
+The check uses the static availability of the persons
+(not_on_shifts_per_weekday, not_in_timespan, and no volunteers
+on a holyday) and a relaxation of the rules of the schedule
+(see solver.py). Per service it computes the maximum flow
+in a network:
+
+    source -> person -> window of weeks -> week -> days -> shift -> sink
+
+- person: at most the shifts the person can take in the quarter
+- window: the weeks from monday to friday in the disjoint blocks
+    of rules.week_blocks(), at most <shifts> each (shifts_per_weeks);
+    the weekends in windows of WEEKENDCOUNTER weeks, at most one each
+- week: at most <shifts> / <per_weeks> (rounded up) from monday
+    to friday, and at most one shift in a weekend
+- days: at most one shift on the days monday and tuesday, on
+    wednesday and thursday, on friday and on saturday and sunday
+    (not more than one shift per day and not two days in a row)
+- shift: one person of the service per shift
+
+The network drops some rules (e.g. not two days in a row from tuesday
+to wednesday, not more than two shifts in a week), so every schedule
+is a flow in it. The maximum flow is therefore an upper bound of
+the shifts that any schedule can fill, and demand - maximum flow is a proven
+lower bound of the unfilled shifts. If a schedule has more unfilled
+shifts than that, the scheduler could have done better;
+if it has exactly that many, there is a real shortage.
+
+The same bound is computed for each weekday and shift on its own.
+
+Example:
+    result = feasibility.check(agenda, volunteers, holydays)
+    for line in feasibility.report_lines(result):
+        print(line)
+"""
+from collections import deque
+from collections import namedtuple
+
+import const
+import rules
+
+SERVICES = ('verzorger', 'algemeen')
+
+# The days of a week in pairs of days in a row, see _coverable().
+# key=(int) weekday, value = (int) pair: monday and tuesday,
+# wednesday and thursday, friday, saturday and sunday.
+PAIR_OF_WEEKDAY = {1: 0, 2: 0, 3: 1, 4: 1, 5: 2, 6: 3, 7: 3}
+
+# The persons are added to the network in groups of this size,
+# see _coverable()
+PERSONS_PER_FLOW = 20
+
+# The result of the check for one service.
+#   demand: (int) shifts to fill, holydays are not counted
+#   capacity: (int) sum of the shifts each person can take
+#   coverable: (int) maximum flow, the most shifts a schedule can fill
+#   lower_bound: (int) demand - coverable, the proven minimum
+#       of the unfilled shifts
+#   lower_bound_per_slot: dict of key=((int) weekday, (int) shift),
+#       value = (int) proven minimum of the unfilled shifts
+#       on that weekday and shift, only the slots with a shortage
+ServiceFeasibility = namedtuple('ServiceFeasibility', (
+    'demand', 'capacity', 'coverable', 'lower_bound',
+    'lower_bound_per_slot'))
+
+
+class FlowNetwork:
+    """A network for max_flow(), with Dinic's algorithm.
+    The edges are stored in flat lists. Edge e ^ 1 is the
+    reverse edge of edge e.
+
+    Attributes:
+        adjacency: (list)
+            Per node the list of its edges.
+        target: (list)
+            Per edge the node it points to.
+        capacity: (list)
+            Per edge the remaining capacity.
+    """
+    def __init__(self):
+        self.adjacency = []
+        self.target = []
+        self.capacity = []
+
+    def add_node(self):
+        """Add a node and return its number.
+        """
+        self.adjacency.append([])
+        return len(self.adjacency) - 1
+
+    def add_edge(self, source, target, capacity):
+        """Add an edge and return its number.
+        """
+        edge = len(self.target)
+        self.adjacency[source].append(edge)
+        self.target.append(target)
+        self.capacity.append(capacity)
+        self.adjacency[target].append(len(self.target))
+        self.target.append(source)
+        self.capacity.append(0)
+        return edge
+
+    def push(self, path):
+        """Send one unit of flow along the edges in <path>
+        if they all have capacity left. Return the flow.
+        """
+        capacity = self.capacity
+        if not all(capacity[edge] for edge in path):
+            return 0
+        for edge in path:
+            capacity[edge] -= 1
+            capacity[edge ^ 1] += 1
+        return 1
+
+    def _levels(self, source):
+        """Return per node the distance from <source>
+        over edges with capacity left, -1 if not reachable.
+        """
+        level = [-1] * len(self.adjacency)
+        level[source] = 0
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            for edge in self.adjacency[node]:
+                next_node = self.target[edge]
+                if self.capacity[edge] > 0 and level[next_node] < 0:
+                    level[next_node] = level[node] + 1
+                    queue.append(next_node)
+        return level
+
+    def _blocking_flow(self, source, sink, level):
+        """Send flow along the shortest paths from <source> to <sink>
+        until there is none left. Return the flow.
+        """
+        adjacency, target, capacity = (
+            self.adjacency, self.target, self.capacity)
+        position = [0] * len(adjacency)
+        total = 0
+        while True:
+            path = []
+            node = source
+            while node != sink:
+                edges = adjacency[node]
+                while position[node] < len(edges):
+                    edge = edges[position[node]]
+                    if (capacity[edge] > 0
+                            and level[target[edge]] == level[node] + 1):
+                        break
+                    position[node] += 1
+                else:
+                    # A dead end: leave it out and go one step back
+                    if node == source:
+                        return total
+                    level[node] = -1
+                    node = target[path.pop() ^ 1]
+                    position[node] += 1
+                    continue
+                path.append(edge)
+                node = target[edge]
+            flow = min(capacity[edge] for edge in path)
+            for edge in path:
+                capacity[edge] -= flow
+                capacity[edge ^ 1] += flow
+            total += flow
+
+    def max_flow(self, source, sink):
+        """Return the maximum flow from <source> to <sink>.
+        The remaining capacities are kept in the network.
+        """
+        flow = 0
+        while True:
+            level = self._levels(source)
+            if level[sink] < 0:
+                return flow
+            flow += self._blocking_flow(source, sink, level)
+
+
+def _available_items(person, items, agenda):
+    """Return the items of <items> on which <person> is available,
+    according to the static rules.
+    """
+    blocked = set()
+    for timespan in person.not_in_timespan:
+        blocked.update(id(ag_item)
+                       for ag_item in agenda.items_in_timespan(*timespan))
+    not_on = person.not_on_shifts_per_weekday
+    return [ag_item for ag_item in items
+            if id(ag_item) not in blocked
+            and ag_item.shift not in not_on.get(ag_item.weekday, ())]
+
+
+def _person_capacity(person, weeknrs):
+    """Return the most shifts <person> can take in the weeks
+    of <weeknrs>: per block of weeks from monday to friday,
+    and per window of weekends.
+    """
+    week_count = len(weeknrs)
+    shifts, per_weeks = (person.shifts_per_weeks.shifts,
+                         person.shifts_per_weeks.per_weeks)
+    blocks = rules.week_blocks(weeknrs, person.shifts_per_weeks)
+    weekdays = min(len(blocks) * shifts,
+                   week_count * -(-shifts // per_weeks))
+    if person.name in const.PERSONS_ALWAYS_IN_WEEKEND:
+        weekends = week_count
+    else:
+        weekends = -(-week_count // const.WEEKENDCOUNTER)
+    return weekdays + weekends
+
+
+def _coverable(items, persons, agenda, agenda_items, available_items,
+               week_position):
+    """Return the maximum flow of the network of <items>
+    and <persons> (see the module docstring), and the items
+    without flow. <agenda_items> are the items of <agenda> to schedule.
+    <available_items> has per person name the agenda_items
+    on which the person is available, and gets the persons
+    that are not in it yet. <week_position> is
+    the position of each weeknr in the agenda.
+    """
+    weeknrs = list(week_position)
+    network = FlowNetwork()
+    source = network.add_node()
+    sink = network.add_node()
+    # key=id(ag_item), value = (node, edge to the sink)
+    item_node = {}
+    for ag_item in items:
+        node = network.add_node()
+        item_node[id(ag_item)] = (node, network.add_edge(node, sink, 1))
+
+    flow = 0
+    for count, person in enumerate(persons, 1):
+        # The maximum flow only grows with more persons, so stop
+        # as soon as all items are covered.
+        if not count % PERSONS_PER_FLOW:
+            flow += network.max_flow(source, sink)
+            if flow == len(items):
+                break
+        if person.name not in available_items:
+            available_items[person.name] = _available_items(
+                person, agenda_items, agenda)
+        available = [ag_item for ag_item in available_items[person.name]
+                     if id(ag_item) in item_node]
+        if not available:
+            continue
+        person_node = network.add_node()
+        person_edge = network.add_edge(
+            source, person_node, _person_capacity(person, weeknrs))
+        shifts, per_weeks = (person.shifts_per_weeks.shifts,
+                             person.shifts_per_weeks.per_weeks)
+        if person.name in const.PERSONS_ALWAYS_IN_WEEKEND:
+            weekend_size = 1
+        else:
+            weekend_size = const.WEEKENDCOUNTER
+        # The block of the weeks from monday to friday per position
+        blocks = rules.week_blocks(weeknrs, person.shifts_per_weeks)
+        block_of = {position: block
+                    for block, positions in enumerate(blocks)
+                    for position in positions}
+        # The nodes of the person for a window, a week and two days,
+        # with the edges from the source to the node.
+        # key=(position, weekend), value = (node, edges)
+        windows = {}
+        weeks = {}
+        # key=(position, pair of days), value = (node, edges)
+        days = {}
+        for ag_item in available:
+            position = week_position[ag_item.weeknr]
+            pair = PAIR_OF_WEEKDAY[ag_item.weekday]
+            day = days.get((position, pair))
+            if day is None:
+                weekend = ag_item.weekday in (6, 7)
+                week = weeks.get((position, weekend))
+                if week is None:
+                    if weekend:
+                        key = (position // weekend_size, weekend)
+                    else:
+                        key = (block_of[position], weekend)
+                    window = windows.get(key)
+                    if window is None:
+                        node = network.add_node()
+                        window = (node, (person_edge, network.add_edge(
+                            person_node, node, 1 if weekend else shifts)))
+                        windows[key] = window
+                    node = network.add_node()
+                    week = (node, window[1] + (network.add_edge(
+                        window[0], node,
+                        1 if weekend else -(-shifts // per_weeks)),))
+                    weeks[(position, weekend)] = week
+                node = network.add_node()
+                day = (node, week[1] + (network.add_edge(week[0], node, 1),))
+                days[(position, pair)] = day
+            item = item_node[id(ag_item)]
+            edge = network.add_edge(day[0], item[0], 1)
+            # Start with a greedy flow, so max_flow() has less to do
+            flow += network.push(day[1] + (edge, item[1]))
+    else:
+        flow += network.max_flow(source, sink)
+    uncovered = [ag_item for ag_item in items
+                 if network.capacity[item_node[id(ag_item)][1]]]
+    return flow, uncovered
+
+
+def check(agenda, volunteers, holydays):
+    """Return the feasibility of scheduling <volunteers>
+    in <agenda>, as a dict of key=service, value = ServiceFeasibility.
+    The shifts on <holydays> are not scheduled.
+    """
+    week_position = agenda.week_positions
+    holydays = set(holydays)
+    items = [ag_item for ag_item in agenda.items
+             if ag_item.date not in holydays]
+    weeknrs = list(week_position)
+    result = {}
+    for service in SERVICES:
+        persons = list(volunteers.persons_by_service[service].values())
+        available_items = {}
+        coverable, uncovered = _coverable(
+            items, persons, agenda, items, available_items, week_position)
+        # The flow of the service is also a flow for each weekday
+        # and shift on its own, so only a weekday and shift with
+        # uncovered items can have a shortage.
+        lower_bound_per_slot = {}
+        for key in dict.fromkeys(
+                (ag_item.weekday, ag_item.shift) for ag_item in uncovered):
+            slot_items = [
+                ag_item for ag_item in agenda.items_on_weekday_and_shift(*key)
+                if ag_item.date not in holydays]
+            slot_coverable, _ = _coverable(
+                slot_items, persons, agenda, items, available_items,
+                week_position)
+            if slot_coverable < len(slot_items):
+                lower_bound_per_slot[key] = len(slot_items) - slot_coverable
+        result[service] = ServiceFeasibility(
+            demand=len(items),
+            capacity=sum(_person_capacity(person, weeknrs)
+                         for person in persons),
+            coverable=coverable,
+            lower_bound=len(items) - coverable,
+            lower_bound_per_slot=lower_bound_per_slot)
+    return result
+
+
+def lower_bound(result):
+    """Return the proven minimum of the unfilled shifts
+    as a tuple (caretakers, generalists), like
+    Scheduler.count_not_scheduled_shifts().
+    """
+    return result['verzorger'].lower_bound, result['algemeen'].lower_bound
+
+
+def report_lines(result):
+    """Yield the lines of the report of the check <result>.
+    """
+    for service in SERVICES:
+        feasibility = result[service]
+        yield (f'{service}: {feasibility.demand} diensten, capaciteit '
+               f'{feasibility.capacity}, hoogstens {feasibility.coverable} '
+               f'te vullen, minstens {feasibility.lower_bound} ongepland')
+        for (weekday, shift), shortage in sorted(
+                feasibility.lower_bound_per_slot.items()):
+            yield (f'  {const.WEEKDAY_NAME_LOOKUP[weekday]} '
+                   f'{const.SHIFTNUMBER_LABEL_LOOKUP[shift]:9}: '
+                   f'minstens {shortage} ongepland')
@@ -1,11 +1,14 @@
 from datetime import date
 from datetime import timedelta
+from functools import lru_cache
 from dateutil.easter import easter
 
 
+@lru_cache
 def determine_holydays(year):
     """Calculate the days of <year>.
     Returns a tuple of datetime.date instances.
+    The days of a year are calculated once per process.
     """
     days = []
     easter_date = easter(year)
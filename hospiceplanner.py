@@ -34,20 +34,36 @@ __version__ = "1.0"
 
 import argparse
 from collections import Counter
-import csv
-from datetime import datetime
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import copy
 from datetime import timedelta
 import locale
 from pathlib import Path
 import random
 import textwrap
+from types import MappingProxyType
 
-from ordered_set import OrderedSet
+from openpyxl import Workbook
 
+import availability
+import carryover
+import exceptions
+import export
+import feasibility
 import init_agenda
 import init_volunteers
 import const
 import holyday
+import repair
+import rules
+import snapshot
+import solver
+
+# The quality of a schedule. Compared as a tuple: lower is better,
+# and the number of unscheduled shifts counts first.
+Score = namedtuple(
+    'Score', ('unscheduled_shifts', 'unused_volunteers', 'not_in_weekend'))
 
 
 class Scheduler:
@@ -79,8 +95,38 @@ class Scheduler:
             The week that is being scheduled.
         holydays: (tuple)
             Date_objects that are a holyday for hospice. 
+        preferring_persons: (dict)
+            key=(service, weekday, shift), value = tuple of 
+            (person name, preferred shifts on the weekday) of the persons
+            with a preference for the weekday and shift.
+        persons_with_future_prefs: (dict)
+            key=(service, weekday, shift), value = tuple of person names
+            that have a preference for a shift later than the key.
+        week_shift_count: (mapping, read-only)
+            key=(int) weeknr, value = mapping of person name: number of
+            shifts the person is scheduled for in that week.
+        random: (random.Random)
+            The random generator for all random choices of the scheduler.
+            Made with <seed>, unless an instance <rng> is given.
+            The same seed and the same sourcefile give the same agenda.
+        not_available_next_quarter: (set)
+            Person names that are not available in the first week
+            of the next quarter (see all_week_not_available()).
+        scheduled_items: (int)
+            The number of agenda items that schedule_volunteers()
+            has scheduled. The next call continues with the next item.
+        carried_over_dates: (dict)
+            key=person name, value = set of date_objects on which 
+            the person is not available because of the quarter before
+            (see carry_over()), for the checks after scheduling
+            (see rules.RuleCheck).
+        carried_over_counters: (dict)
+            key=person name, value = (availability_counter, 
+            weekend_counter) of the person at the start of the first
+            week, taken over from the quarter before (see carry_over()).
     """
-    def __init__(self, year, quarter, version, agenda, volunteers):
+    def __init__(self, year, quarter, version, agenda, volunteers,
+                 seed=None, rng=None):
         # Show month- and weeknames in Dutch
         # in agenda.csv file.
         locale.setlocale(locale.LC_TIME, "nl_NL.utf8")
@@ -91,6 +137,7 @@ class Scheduler:
         self.agenda = agenda
         self.Volunteers = volunteers
         self.all_persons = volunteers.persons
+        self.random = rng if rng is not None else random.Random(seed)
 
         # Prepare the agenda with personal wishes,
         # en register the availability in each agenda item .
@@ -104,17 +151,42 @@ class Scheduler:
         # Get the holydays of this year in datetime.date format
         self.holydays = holyday.determine_holydays(self.year)
 
-    def schedule_volunteers(self):
+        # Preferences per (service, weekday, shift).
+        self._compile_preferences()
+
+        # Per weeknr a Counter of the shifts per person.
+        # Updated in _update_week_shift_count().
+        self._week_shift_count = {}
+
+        self.not_available_next_quarter = set()
+        self.scheduled_items = 0
+        self.carried_over_dates = {}
+        self.carried_over_counters = {}
+
+    @property
+    def week_shift_count(self):
+        """Read-only view of the number of shifts per person per week.
+        """
+        return MappingProxyType({
+            weeknr: MappingProxyType(counter)
+            for weeknr, counter in self._week_shift_count.items()})
+
+    def schedule_volunteers(self, until=None):
         """schedule_volunteers() is the main method 
         which calls all methods to make a plan for a year quarter. 
         Fill each item in the agenda with the names of two volunteers, 
         one for service 'caretaker' (= 'verzorger') 
         and one for service 'generic' (= 'algemeen').
+        With <until> (a date_object) only the items up to and including
+        that date are scheduled. The next call continues with the
+        items after it, e.g. in a fork (see fork()).
         """
         # Directive: do not make 'agenda_item' a property of the class, 
         # because from the paramater it is now clear 
         # that the private functions operate on the agenda_item.
-        for agenda_item in self.agenda.items:
+        for agenda_item in self.agenda.items[self.scheduled_items:]:
+            if until is not None and agenda_item.date > until:
+                break
             # Reset the availability of all persons at the start of each week
             
             # Is the scheduler starting a new week?
@@ -126,8 +198,40 @@ class Scheduler:
             group_not_available = (
                 self._determine_group_not_available(agenda_item))
             self._schedule_2_persons(agenda_item, group_not_available)
+            self._update_week_shift_count(agenda_item)
             self._update_availability_counter(agenda_item)
             self._update_persons_not_available(agenda_item)
+            self.scheduled_items += 1
+
+    def fork(self):
+        """Return a copy of the scheduler with its own agenda, persons
+        and random generator, e.g. to try alternatives for the rest of
+        a partly scheduled agenda and keep the best one:
+
+            scheduler.schedule_volunteers(until=date)
+            branch = scheduler.fork()
+            branch.schedule_volunteers()
+
+        Scheduling in the fork doesn't change this scheduler.
+        The static rules are not applied again, and what doesn't change
+        while scheduling (the preferences) is shared.
+        """
+        fork = copy.copy(self)
+        fork.agenda = self.agenda.fork()
+        fork.Volunteers = self.Volunteers.fork()
+        fork.all_persons = fork.Volunteers.persons
+        fork.random = random.Random()
+        fork.random.setstate(self.random.getstate())
+        fork._week_shift_count = {
+            weeknr: Counter(counter)
+            for weeknr, counter in self._week_shift_count.items()}
+        fork.not_available_next_quarter = set(
+            self.not_available_next_quarter)
+        fork.carried_over_dates = {
+            name: set(dates)
+            for name, dates in self.carried_over_dates.items()}
+        fork.carried_over_counters = dict(self.carried_over_counters)
+        return fork
 
     def _determine_group_not_available(self, agenda_item):
         """Return the set of persons that are marked as 
@@ -149,25 +253,14 @@ class Scheduler:
         # We only have to test if the person is this week in 2 shifts or more.
         if agenda_item.date.isoweekday() in (6, 7):
             # It's a weekend.
-            # Search persons with more than 1 shifts so far this week
-            # and save them in a list.
-            persons_scheduled_this_week = ([
-                ag_item.persons 
-                for ag_item in self.agenda.items 
-                if ag_item.weeknr == agenda_item.weeknr])
-            flatlist = [item for sublist in persons_scheduled_this_week 
-                        for item in sublist]
-            # Get a dict of all scheduled persons 
-            # and count-of scheduled this week
-            cnt = Counter(flatlist)
-            # Extract the persons that are scheduled more than once.
-            # They are not available.
-            scheduled_2_times = [key for key in cnt.keys() if cnt[key] > 1]
+            # The persons that are scheduled more than once
+            # so far this week are not available.
+            cnt = self._week_shift_count.get(agenda_item.weeknr, Counter())
 
             dynamic_not_available = (set(tuple([
                 p.name for p in self.all_persons 
                 if p.weekend_counter != const.WEEKENDCOUNTER 
-                or p.name in scheduled_2_times])))
+                or cnt[p.name] > 1])))
         else:
             # Not a weekend day. Normal rules apply.
             # Unavailable if counter == 0.
@@ -198,29 +291,20 @@ class Scheduler:
             """If a person has a preference for a weekday-and-shift,
             that person is here chosen before others.
             """
-            candidates = []
-            persons = [
-                p for p in self.all_persons
-                if p.preferred_shifts
-                and p.service == service]
-            for person in persons:
-                if person.name in diff_group:
-                    for pref_weekday, pref_shifts\
-                            in person.preferred_shifts.items():
-                        
-                        # It is possible that more than 1 volunteer
-                        # has a preference for the same day and shift.
-                        # Make a list, and randomly choose one name at return.
-                        # And if a person has more than 1 shift preference
-                        # on the day, then randomly select 1 shift.
-                        # Otherwise the scheduler would always pick
-                        # the first day in the range.
-                        if (agenda_item.weekday == pref_weekday
-                                and agenda_item.shift 
-                                in [random.choice(pref_shifts)]):
-                            candidates.append(person.name)
+            # It is possible that more than 1 volunteer
+            # has a preference for the same day and shift.
+            # Make a list, and randomly choose one name at return.
+            # And if a person has more than 1 shift preference
+            # on the day, then randomly select 1 shift.
+            # Otherwise the scheduler would always pick
+            # the first day in the range.
+            key = (service, agenda_item.weekday, agenda_item.shift)
+            candidates = [
+                name for name, pref_shifts in self.preferring_persons[key]
+                if name in diff_group
+                and agenda_item.shift == self.random.choice(pref_shifts)]
             if candidates:
-                return random.choice(candidates)
+                return self.random.choice(candidates)
             else:
                 return None
 
@@ -229,49 +313,15 @@ class Scheduler:
             shifts in the future. If we plan them too soon, they are no
             longer available for shifts that have their preference.
             """
-            current_weekday = agenda_item.weekday
-            current_shift = agenda_item.shift
-            
-            # Make a list of persons that heve a preferred shift
-            tmp_group = [(
-                p.name, p.preferred_shifts)
-                for p in self.all_persons
-                if p.service == service and p.preferred_shifts]
-            
-            result = []
-            for prs, pref in tmp_group:
-                # if the current workdsy is in the pref workdays,
-                # and the current shift in that wotkday,
-                # than do not remove the person from the
-                # available persons, because it IS the preferred
-                # day and shift matching the current day and shift.
-                if not (current_weekday in pref.keys()
-                        and current_shift in pref[current_weekday]):
-                    for pref_weekday in pref.keys():
-                        # If the pref_weekday is in the future,
-                        # Add this person. She wil be discarded for
-                        # this agenda item.
-                        if pref_weekday > current_weekday:
-                            result.append(prs)
-                            break
-                        else:
-                            # Else check if there are future shifts
-                            # on the current workday.
-                            for pref_shift in pref[pref_weekday]:
-                                # AND if the pref_shift is later on the day
-                                if pref_shift > current_shift:
-                                    # Then add the person to the list of
-                                    # persons to be discarded 
-                                    # for the current shift.
-                                    result.append(prs)
-                                    break
-
-            for person in result:
-                # Do not remove any person if there is only one in diff_group
-                # for then we would have no one left for this shift.
-                # In that case no preference is honoured.
-                if len(diff_group) > 1:
-                    diff_group.discard(person)
+            key = (service, agenda_item.weekday, agenda_item.shift)
+            result = [name for name in self.persons_with_future_prefs[key]
+                      if name in diff_group]
+            # Do not remove any person if there is only one in diff_group
+            # for then we would have no one left for this shift.
+            # In that case no preference is honoured.
+            if len(result) == len(diff_group):
+                result = result[:-1]
+            diff_group.difference_update(result)
 
         # Do not schedule on a holyday
         if agenda_item.date in self.holydays:
@@ -280,58 +330,69 @@ class Scheduler:
         else:
             # The two volunteers for this shift 
             # are selected from two different pools
-            diff_group_generic = self.generalist_names - group_not_available
-            diff_group_caretaker = self.caretaker_names - group_not_available
+            diff_group_generic, diff_group_caretaker = (
+                self._available_pools(group_not_available))
                 
             remove_persons_with_future_prefs(
                 'algemeen', diff_group_generic, agenda_item)
             remove_persons_with_future_prefs(
                 'verzorger', diff_group_caretaker, agenda_item)
 
-            # Select a random person from both sets.
-            # Note: function 'random' doesn't operate on a set,
-            # so we convert it to a tuple.
+            # Select a person from both sets.
 
             # Choose generalist
             if diff_group_generic:
-                diff_group_generic = tuple(diff_group_generic)
                 pref_person = helper_pref_person(
                     'algemeen', diff_group_generic)
                 if pref_person:
                     person_generic = pref_person
                 else:
-                    person_generic = self.Volunteers\
-                        .get_optimal_person(diff_group_generic)
+                    person_generic = self._optimal_person(
+                        diff_group_generic)
             else:
                 person_generic = ""  # nobody is available
                 
             # Choose caretaker
             if diff_group_caretaker:
-                diff_group_caretaker = tuple(diff_group_caretaker)
                 pref_person = helper_pref_person(
                     'verzorger', diff_group_caretaker)
                 if pref_person:
                     person_caretaker = pref_person
                 else:
-                    person_caretaker = self.Volunteers\
-                        .get_optimal_person(diff_group_caretaker)
+                    person_caretaker = self._optimal_person(
+                        diff_group_caretaker)
             else:
                 person_caretaker = ""  # nobody is available
         
         agenda_item.persons.append(person_caretaker)
         agenda_item.persons.append(person_generic)
-        
-        # If the volunteer is scheduled in a weekend,
-        # reset the weekend counter So that she will
-        # not be scheduled in a weekend for the next
-        # three weeks (untill the counter reaches WEEKENDCOUNTER).
+        self._reset_weekend_counter(agenda_item)
+
+    def _reset_weekend_counter(self, agenda_item):
+        """If the volunteer is scheduled in a weekend,
+        reset the weekend counter So that she will
+        not be scheduled in a weekend for the next
+        three weeks (untill the counter reaches WEEKENDCOUNTER).
+        """
         if agenda_item.date.isoweekday() in (6, 7):
-            persons = self.Volunteers.search([
-                person_caretaker, person_generic])
+            persons = self.Volunteers.search(agenda_item.persons)
             for p in persons:
                 if p.name not in const.PERSONS_ALWAYS_IN_WEEKEND:
                     p.weekend_counter = 0
 
+    def _available_pools(self, group_not_available):
+        """Return the sets of generalist names and caretaker names
+        that are not in group_not_available.
+        """
+        return (self.generalist_names - group_not_available,
+                self.caretaker_names - group_not_available)
+
+    def _optimal_person(self, diff_group):
+        """Return the person name from diff_group that is
+        saved for last (see Volunteers.get_optimal_person()).
+        """
+        return self.Volunteers.get_optimal_person(diff_group)
+
     def _update_persons_not_available(self, current_agenda_item):
         """Add persons to "persons_not_available" of the
         CURRENT and NEXT day, so that no person is scheduled 
@@ -360,19 +421,20 @@ class Scheduler:
             #   of the three available shifts
             #   or 1 shift has been planned of the available 2 shifts.
             for shiftcount, per_weeks in shifts_per_weeks_argument:
-                person_selection = [p for p in self.all_persons
-                        if p.name in current_agenda_item.persons
-                        and (p.shifts_per_weeks.shifts == shiftcount
-                        and p.shifts_per_weeks.per_weeks == per_weeks
-                        and p.availability_counter == 1)]
+                persons = self.Volunteers.persons_by_shifts_per_weeks.get(
+                    (shiftcount, per_weeks), {})
+                person_selection = [persons[name] 
+                        for name in current_agenda_item.persons
+                        if name in persons
+                        and persons[name].availability_counter == 1]
                 if person_selection:
                     # select all agenda items for this week
-                    ag_items = [i for i in self.agenda.items
-                                if i.weeknr == current_agenda_item.weeknr]
+                    ag_items = self.agenda.items_in_week(
+                        current_agenda_item.weeknr)
                     # make the volunteers unavailable for this week
                     for item in ag_items:
                         for p in person_selection:
-                            item.persons_not_available.add(p.name)
+                            item.add_not_available(p.name)
 
                     # If 2 times per 3 weeks, then 
                     # make the next week also unavailable.
@@ -380,22 +442,25 @@ class Scheduler:
                     if ((shiftcount == 2 and per_weeks == 3)
                             or (shiftcount == 1 and per_weeks == 2)):
                         # select all agenda items for the next  week
-                        ag_items = [i for i in self.agenda.items
-                                    if i.weeknr == 
-                                    current_agenda_item.weeknr + 1]
+                        ag_items = self.agenda.items_in_week(
+                            current_agenda_item.weeknr + 1)
+                        if not ag_items:
+                            # The next week is in the next quarter
+                            self.not_available_next_quarter.update(
+                                p.name for p in person_selection)
                         # make the agenda items unavailable for this week
                         for item in ag_items:
                             for p in person_selection:
-                                item.persons_not_available.add(p.name)
+                                item.add_not_available(p.name)
 
         current_day = current_agenda_item.date
         next_day = current_day + timedelta(days=1)
-        agenda_items = [i for i in self.agenda.items
-                        if (i.date == current_day or i.date == next_day)]
+        agenda_items = (self.agenda.items_on_date(current_day)
+                        + self.agenda.items_on_date(next_day))
         for item in agenda_items:
             for person_name in current_agenda_item.persons:
                 # '.persons' is: [personname generic, personname caretaker]
-                item.persons_not_available.add(person_name)
+                item.add_not_available(person_name)
 
         # Make the person unavailable for the rest of the week,
         # because the capacity must be distributed
@@ -403,14 +468,27 @@ class Scheduler:
         # on 2 or more shifts per week or once in 2 weeks.
         all_week_not_available([(3, 2), (2, 3), (1, 2)])
         
-        # TODO it is possible that a person has a shift 
-        # on the last day of the quarter.
-        # The scheduler of the next quarter has no knowledge 
-        # of te former planning.
-        # And thus a person can be scheduled 
-        # on the first day of the new quarter: two days in a row.
-        # Solution: register the date for the persons 
-        # in "nietInPeriode" in the csv source file.
+        # A person can have a shift on the last day of the quarter.
+        # The scheduler of the next quarter knows this 
+        # from carry_over(), with the quarter_state() of this quarter.
+
+    def _update_week_shift_count(self, agenda_item):
+        """Count the shifts of the 2 persons in the agenda item
+        for the week of the agenda item.
+        """
+        cnt = self._week_shift_count.setdefault(agenda_item.weeknr, Counter())
+        for person_name in agenda_item.persons:
+            if person_name:
+                cnt[person_name] += 1
+
+    def _count_week_shifts(self):
+        """Count the shifts per person per week again for the whole agenda,
+        after the agenda has been changed other than by 
+        schedule_volunteers().
+        """
+        self._week_shift_count = {}
+        for agenda_item in self.agenda.items:
+            self._update_week_shift_count(agenda_item)
 
     def _update_availability_counter(self, agenda_item):
         """Decrease availability_counter for the 2 persons in the agenda item.
@@ -419,8 +497,7 @@ class Scheduler:
         available for the rest of the week.
         """
         # We need the objects here, not just te names.
-        persons = [p for p in self.all_persons
-                   if p.name in agenda_item.persons]
+        persons = self.Volunteers.search(agenda_item.persons)
         # persons = 
         #   [instance of a person_generic, instance of a person_caretaker]
         for p in persons:
@@ -456,6 +533,39 @@ class Scheduler:
                     person.availability_counter = (
                         person.shifts_per_weeks.shifts)
 
+    def _compile_preferences(self):
+        """Compile the preferred_shifts of all persons before
+        scheduling starts, see preferring_persons and
+        persons_with_future_prefs. The tuples keep the order 
+        of Volunteers.persons.
+        """
+        self.preferring_persons = {}
+        self.persons_with_future_prefs = {}
+        for service, persons in self.Volunteers.persons_by_service.items():
+            persons = [p for p in persons.values() if p.preferred_shifts]
+            for weekday in range(1, 8):
+                for shift in range(1, 5):
+                    preferring = []
+                    future = []
+                    for p in persons:
+                        pref = p.preferred_shifts
+                        if shift in pref.get(weekday, ()):
+                            # It IS the preferred day and shift,
+                            # so the person is not removed.
+                            preferring.append((p.name, pref[weekday]))
+                        elif any(
+                                # The pref_weekday is in the future,
+                                pref_weekday > weekday 
+                                # or there is a later pref_shift.
+                                or any(pref_shift > shift 
+                                       for pref_shift in pref_shifts)
+                                for pref_weekday, pref_shifts 
+                                in pref.items()):
+                            future.append(p.name)
+                    key = (service, weekday, shift)
+                    self.preferring_persons[key] = tuple(preferring)
+                    self.persons_with_future_prefs[key] = tuple(future)
+
     def _apply_static_rules(self):
         """Initialise tagenda.item.persons not_available 
         with the preferences of each volunteer i.e.
@@ -469,152 +579,570 @@ class Scheduler:
             for weekday, shifts in person.not_on_shifts_per_weekday.items():
                 for shift in shifts:
                     for ag_item in self.agenda.searchitems(weekday, shift):
-                        ag_item.persons_not_available.add(person.name)
+                        ag_item.add_not_available(person.name)
 
             # person is not working between dates 
             # person.not_in_timespan: 
-            #   e.g. [ '22-4-2023, 29-3-2023, 2-1-2023>3-1-2023' ]
+            #   e.g. ((date(2023, 1, 2), date(2023, 1, 3)), ...)
             for timespan in person.not_in_timespan:
                 for ag_item in self.agenda.searchitems(timespan=timespan):
-                    ag_item.persons_not_available.add(person.name)
+                    ag_item.add_not_available(person.name)
+
+    def _make_not_available(self, name, ag_items):
+        """Make the person <name> not available for <ag_items>.
+        """
+        for ag_item in ag_items:
+            ag_item.add_not_available(name)
+
+    def quarter_state(self):
+        """Return the state of the persons at the end of 
+        the scheduled agenda (carryover.QuarterState),
+        to continue with the next quarter (see carry_over()).
+        Note: the counters are those of schedule_volunteers(),
+        changes by repair.Repair are only in the last_shift_date.
+        """
+        last_date = self.agenda.items[-1].date
+        last_shift_dates = {}
+        for ag_item in self.agenda.items:
+            for name in ag_item.persons:
+                if name:
+                    last_shift_dates[name] = ag_item.date
+        # The week after the last week of the agenda
+        next_week_end = last_date + timedelta(days=7)
+        persons = {}
+        for person in self.all_persons:
+            not_available_until = None
+            if person.name in self.not_available_next_quarter:
+                not_available_until = next_week_end
+            persons[person.name] = carryover.PersonState(
+                person.availability_counter, person.weekend_counter,
+                last_shift_dates.get(person.name), not_available_until)
+        return carryover.QuarterState(
+            self.year, self.quarter, last_date, persons)
+
+    def carry_over(self, state):
+        """Continue where the quarter before this one stopped:
+        take over the counters of the persons in <state>
+        (a carryover.QuarterState), and make the persons 
+        not available on the day after their last shift and
+        in the blocked week of the new quarter.
+        Call this before schedule_volunteers().
+        Persons who are not in <state> start from scratch.
+        """
+        first_date = self.agenda.items[0].date
+        if state.last_date + timedelta(days=1) != first_date:
+            raise exceptions.QuarterStateError(
+                f'De planning van {state.quarter}e kwartaal {state.year} '
+                f'sluit niet aan op het {self.quarter}e kwartaal '
+                f'{self.year}')
+        for person in self.all_persons:
+            person_state = state.persons.get(person.name)
+            if person_state is None:
+                continue
+            person.availability_counter = person_state.availability_counter
+            person.weekend_counter = person_state.weekend_counter
+            # Not two days in a row
+            if person_state.last_shift_date == state.last_date:
+                self._carry_over_not_available(
+                    person.name, self.agenda.items_on_date(first_date))
+            if person_state.not_available_until:
+                self._carry_over_not_available(
+                    person.name, self.agenda.items_in_timespan(
+                        first_date, person_state.not_available_until))
+        # The first week of this quarter is a new week
+        self._reset_availability_counter(self.currentweek)
+        self._update_weekend_counter()
+        self.carried_over_counters = {
+            person.name: (person.availability_counter,
+                          person.weekend_counter)
+            for person in self.all_persons if person.name in state.persons}
+
+    def _carry_over_not_available(self, name, ag_items):
+        """Make the person <name> not available for <ag_items>
+        because of the quarter before, see carried_over_dates.
+        """
+        self._make_not_available(name, ag_items)
+        self.carried_over_dates.setdefault(name, set()).update(
+            ag_item.date for ag_item in ag_items)
+
+    def rule_check(self):
+        """Return a rules.RuleCheck with the shifts of the persons
+        in the agenda, to check many shifts of the scheduled agenda.
+        """
+        check = rules.RuleCheck(self.agenda, self.Volunteers, self.holydays,
+                                self.carried_over_dates,
+                                self.carried_over_counters)
+        check.add_scheduled()
+        return check
+
+    def can_take(self, name, agenda_item, check=None):
+        """Return True if person <name> can be scheduled in 
+        <agenda_item> of the scheduled agenda without breaking a rule.
+        The rules are those of rules.py. Give a rule_check() as <check>
+        to check more than one shift of the same agenda.
+        """
+        check = check or self.rule_check()
+        index = self.agenda.index_of(agenda_item)
+        vacated = index if name in agenda_item.persons else None
+        return check.can_take(name, index, vacated)
+
+    def _replacement(self, agenda_item, service, check):
+        """Return the name of the person of <service> who is chosen
+        for <agenda_item> of the scheduled agenda, or "" if nobody
+        can take it (see rule_check() for <check>). A person with 
+        a preference for the weekday and shift comes first, 
+        then Volunteers.get_optimal_person().
+        """
+        persons = self.Volunteers.persons_by_service[service]
+        index = self.agenda.index_of(agenda_item)
+        candidates = [name for name in persons
+                      if check.can_take(name, index)]
+        if not candidates:
+            return ""
+        key = (service, agenda_item.weekday, agenda_item.shift)
+        preferring = [name for name, _ in self.preferring_persons[key]
+                      if name in candidates]
+        return self.Volunteers.get_optimal_person(preferring or candidates)
+
+    def reschedule_unavailable(self, name, startdate, enddate=None):
+        """Person <name> is not available from <startdate> up to and
+        including <enddate> (or only on <startdate>), after the agenda
+        has been scheduled. Remove the person from the shifts in 
+        the timespan and give each shift to another person who can take 
+        it without breaking a rule (see can_take()).
+        All other shifts stay as they are.
+        Return a list of (agenda item, old name, new name) for each 
+        changed shift. The new name is "" if nobody can take the shift.
+        Raise ValueError if <enddate> is before <startdate>.
+        """
+        if name not in self.Volunteers.persons_by_name:
+            raise exceptions.UnknownPersonnameError(name)
+        person = self.Volunteers.persons_by_name[name]
+        enddate = enddate or startdate
+        if enddate < startdate:
+            raise ValueError(f'De einddatum {enddate} ligt voor '
+                             f'de begindatum {startdate}')
+
+        # Register the timespan like a NietInPeriode
+        person.not_in_timespan = init_volunteers.merge_timespans(
+            person.not_in_timespan + ((startdate, enddate),))
+        ag_items = self.agenda.items_in_timespan(startdate, enddate)
+        self._make_not_available(name, ag_items)
+
+        check = self.rule_check()
+        slot = 0 if person.service == 'verzorger' else 1
+        changes = []
+        for ag_item in ag_items:
+            if ag_item.persons[slot] != name:
+                continue
+            index = self.agenda.index_of(ag_item)
+            ag_item.persons[slot] = ""
+            check.remove(name, index)
+            new_name = self._replacement(ag_item, person.service, check)
+            ag_item.persons[slot] = new_name
+            if new_name:
+                check.add(new_name, index)
+            cnt = self._week_shift_count.setdefault(ag_item.weeknr, Counter())
+            cnt[name] -= 1
+            if new_name:
+                cnt[new_name] += 1
+            changes.append((ag_item, name, new_name))
+        return changes
 
     def write_agenda_to_csv_file(self, filename):
         """Write the agenda to the csv file <filename>.
         """
-        # TODO write to .xlsx file 
-        dateformat = "%-d %b"  # day - short monthname
-        
-        with open(filename, mode='w', encoding='UTF-8') as f:
-            writer = csv.writer(f, delimiter=const.CSV_DELIMITER, 
-                quotechar='"', quoting=csv.QUOTE_ALL)
-            row = (f"Hospice planning {str(self.quarter)}e kwartaal "
-                   f'{str(self.year)}, versie {str(self.version)}')
-            writer.writerow([row])
-            writer.writerow([])
-            
-            weekscount = 13  # number of weeks in a quarter
-            # from the first day of a quarter to the last + 1
-            weekrange = range( 
-                (self.quarter - 1) * weekscount + 1,
-                (self.quarter * weekscount) + 1)
-
-            for pagebreak_indicator, week in enumerate(weekrange):
-                # Pagebreak after every two weeks
-                if pagebreak_indicator > 1 and not (pagebreak_indicator % 2):
-                    writer.writerow(["pagebreak"])
-
-                writer.writerow(["", "", "", "", "WEEK " + str(week)])
-                writer.writerow([])
-                writer.writerow(["", "maandag", "dinsdag", "woensdag",
-                                 "donderdag", "vrijdag", "zaterdag", "zondag"])
-                
-                # get the agenda items for this week
-                ag_items = [i for i in self.agenda.items 
-                            if i.weeknr == week]
-
-                # row with dates, below 'week' indication
-                dates = OrderedSet(tuple(
-                    datetime.strftime(i.date, dateformat) 
-                    for i in ag_items))
-                row = ["dienst"]
-                row.extend(list(dates))
-                writer.writerow(row) 
-                
-                # if a shift has no volunteer, 
-                #   fill the cell with 'not available'
-                no_volunteer_in_shift = (
-                    lambda person: '#N/A' if person == "" else person)
+        export.export_agenda(self, [export.CsvRenderer(filename)])
 
-                # A row for each shift, with the names of 
-                # 7 caretakers and 7 general service persons
-                for shift in range(1, 5):
-                    caretakers = [i.persons[0]
-                                  for i in ag_items if i.shift == shift]
-                    row = [const.SHIFTNUMBER_LABEL_LOOKUP[shift]]
-                    row.extend(list(map(no_volunteer_in_shift, caretakers)))
-                    writer.writerow(row) 
-                    generalists = [i.persons[1] 
-                        for i in ag_items if i.shift == shift]
-                    row = [""]
-                    row.extend(list(map(no_volunteer_in_shift, generalists)))
-                    writer.writerow(row) 
-                    writer.writerow([])
-            print(f'Bestand opgeslagen: {filename}')
+    def write_agenda_to_xlsx_file(self, filename):
+        """Write the agenda to the .xlsx file <filename>.
+        """
+        export.export_agenda(self, [export.XlsxRenderer(filename)])
 
     def write_agenda_to_txt_file(self, filename):
         """Write the agenda to the txt file <filename>
         """
-        with open(filename, 'w') as f:
-            weekday_nr = 0
-            date = ''
-            for item in self.agenda.items:
-                if item.weekday == 1 and weekday_nr == 7: 
-                    f.write('-' * 80 + '\n')  # Draw a line at a new week
-                weekday_nr = item.weekday
-                weekdayname = const.WEEKDAY_NAME_LOOKUP[weekday_nr]
-                if item.date != date:
-                    f.write('\n')
-                date = item.date
-                f.write(f'{item.date} wn:{item.weeknr:>2} {weekdayname} '
-                        f'sh:{item.shift} {item.persons}\n')
-            print(f'Bestand opgeslagen: {filename}')
+        export.export_agenda(self, [export.TxtRenderer(filename)])
 
-    def not_scheduled_shifts(self):
-        """Report the number shifts that could not be scheduled,
-        Seperate for caretakers and generalists, and total.
+    def count_not_scheduled_shifts(self):
+        """Return the number of shifts that could not be scheduled
+        as a tuple (caretakers, generalists). Holydays are not counted,
+        and neither are the items that are not scheduled yet
+        (see scheduled_items).
         """
-        caretakers = [ag_item for ag_item in self.agenda.items
+        ag_items = self.agenda.items[:self.scheduled_items]
+        caretakers = [ag_item for ag_item in ag_items
                       if not ag_item.persons[0]
                       and ag_item.date not in self.holydays]
-        generalists = [ag_item for ag_item in self.agenda.items
+        generalists = [ag_item for ag_item in ag_items
                        if not ag_item.persons[1]
                        and ag_item.date not in self.holydays]
-        cc = len(caretakers)
-        gc = len(generalists)
-        print(f'Aantal ongepland diensten, verzorgers: {cc}, '
-              f'algemenen: {gc}. Totaal: {cc + gc}') 
+        return len(caretakers), len(generalists)
 
-    def persons_not_scheduled_in_weekend(self):
-        """Report which persons are not scheduled in the weekend.
+    def names_not_scheduled(self, weekend_only=False):
+        """Return the set of person names that are not scheduled
+        in the agenda, or not in a weekend if weekend_only is True.
         """
         scheduled_volunteers = set()
         for ag_item in self.agenda.items:
-            if ag_item.weekday in (6, 7):
+            if not weekend_only or ag_item.weekday in (6, 7):
                 scheduled_volunteers.update(ag_item.persons)
+        all_volunteers = set(self.Volunteers.persons_by_name.keys())
+        return all_volunteers - scheduled_volunteers
 
-        all_volunteers = set(tuple([
-            p.name for p in self.all_persons]))
+    def score(self):
+        """Return the Score of the scheduled agenda.
+        A lower score is a better schedule.
+        """
+        return Score(
+            unscheduled_shifts=sum(self.count_not_scheduled_shifts()),
+            unused_volunteers=len(self.names_not_scheduled()),
+            not_in_weekend=len(self.names_not_scheduled(weekend_only=True)))
+
+    def not_scheduled_shifts(self):
+        """Report the number shifts that could not be scheduled,
+        Seperate for caretakers and generalists, and total.
+        """
+        cc, gc = self.count_not_scheduled_shifts()
+        print(f'Aantal ongepland diensten, verzorgers: {cc}, '
+              f'algemenen: {gc}. Totaal: {cc + gc}') 
 
-        unscheduled = all_volunteers - scheduled_volunteers
+    def persons_not_scheduled_in_weekend(self):
+        """Report which persons are not scheduled in the weekend.
+        """
+        unscheduled = self.names_not_scheduled(weekend_only=True)
         if unscheduled:
-            unscheduled = list(unscheduled)
             print('\nDe volgende vrijwilligers zijn niet ' + 
                 'ingepland in het weekend:')
-            for person in self.Volunteers.search(unscheduled):
-                print(f'{person.name:20} {person.service:10} '
-                      f'({person.shifts_per_weeks.shifts},'
-                      f'{person.shifts_per_weeks.per_weeks}) ' 
-                      f'{person.not_on_shifts_per_weekday}'
-                      )
+            for person in self.all_persons:
+                if person.name in unscheduled:
+                    print(f'{person.name:20} {person.service:10} '
+                          f'({person.shifts_per_weeks.shifts},'
+                          f'{person.shifts_per_weeks.per_weeks}) ' 
+                          f'{person.not_on_shifts_per_weekday}'
+                          )
          
     def persons_not_scheduled(self):
         """Report if the capacity of the full group of volunteers
         has been used.
         """
-        scheduled_volunteers = set()
-        for ag_item in self.agenda.items:
-            for person_name in ag_item.persons:
-                scheduled_volunteers.add(person_name)
-        
-        all_volunteers = set(tuple([
-            p.name for p in self.all_persons]))
-
-        unscheduled = all_volunteers - scheduled_volunteers
+        unscheduled = self.names_not_scheduled()
         if unscheduled:
             print('De volgende vrijwilligers komen niet voor ' + 
                 'in de agenda van dit kwartaal:')
-            for person_name in unscheduled:
-                print(person_name)
+            for person in self.all_persons:
+                if person.name in unscheduled:
+                    print(person.name)
+
+
+class BitsetScheduler(Scheduler):
+    """BitsetScheduler schedules exactly like Scheduler, but registers
+    the availability of the volunteers as bitmasks 
+    (see availability.BitsetAvailability) instead of sets of names
+    in each agenda item. The static rules, the blocking of the day
+    after a shift, the blocking of a week and the weekly capacity are
+    all bitwise operations. The persons_not_available of the 
+    agenda items are not used.
+    """
+    def _apply_static_rules(self):
+        """Register the static rules in the bitmasks.
+        """
+        # The last person in the order of get_optimal_person() 
+        # gets the highest bit.
+        position = {p.name: i for i, p in enumerate(self.all_persons)}
+        self.availability = availability.BitsetAvailability(
+            sorted(self.all_persons, key=lambda p: 
+                   (p.not_on_shifts_count, position[p.name])))
+        self.availability.apply_static_rules(self.all_persons, self.agenda)
+        # Per weeknr the mask of persons scheduled more than once.
+        self._scheduled_2_times_masks = {}
+        self._rebuild_counter_masks()
+
+    def _rebuild_counter_masks(self):
+        """Register the availability_counter and weekend_counter
+        of all persons in the masks.
+        """
+        self._counter_zero_mask = 0
+        self._weekend_blocked_mask = 0
+        for person in self.all_persons:
+            self._update_counter_bits(person)
+
+    def _update_counter_bits(self, person):
+        """Register the availability_counter and weekend_counter
+        of <person> in the masks.
+        """
+        bit = self.availability.bits[person.name]
+        if person.availability_counter == 0:
+            self._counter_zero_mask |= bit
+        else:
+            self._counter_zero_mask &= ~bit
+        if person.weekend_counter != const.WEEKENDCOUNTER:
+            self._weekend_blocked_mask |= bit
+        else:
+            self._weekend_blocked_mask &= ~bit
+
+    def _determine_group_not_available(self, agenda_item):
+        """Return the mask of persons that are not available
+        for the current shift. The rules are those of 
+        Scheduler._determine_group_not_available().
+        """
+        group_not_available = self.availability.not_available(agenda_item)
+        if agenda_item.date.isoweekday() in (6, 7):
+            group_not_available |= (
+                self._weekend_blocked_mask
+                | self._scheduled_2_times_masks.get(agenda_item.weeknr, 0))
+        else:
+            group_not_available |= self._counter_zero_mask
+        return group_not_available
+
+    def _available_pools(self, group_not_available):
+        """Return the pools (availability.PersonMask) of generalists 
+        and caretakers that are not in the mask group_not_available.
+        """
+        masks = self.availability.service_masks
+        return (
+            self.availability.pool(masks['algemeen'] & ~group_not_available),
+            self.availability.pool(masks['verzorger'] & ~group_not_available))
+
+    def _optimal_person(self, diff_group):
+        """The bits are ordered like Volunteers.get_optimal_person()
+        orders the persons, so the optimal person is the highest bit.
+        """
+        return self.availability.names[diff_group.mask.bit_length() - 1]
+
+    def _update_week_shift_count(self, agenda_item):
+        super()._update_week_shift_count(agenda_item)
+        cnt = self._week_shift_count[agenda_item.weeknr]
+        self._scheduled_2_times_masks[agenda_item.weeknr] = (
+            self._scheduled_2_times_masks.get(agenda_item.weeknr, 0)
+            | self.availability.mask(
+                name for name in agenda_item.persons if cnt[name] > 1))
+
+    def _update_persons_not_available(self, current_agenda_item):
+        """Make the 2 persons of the agenda item not available
+        on the current and next day, and for the rest of the week
+        (see Scheduler._update_persons_not_available()).
+        Then register their changed counters in the masks.
+        """
+        self.availability.block_day_and_next_day(
+            current_agenda_item.date,
+            self.availability.mask(current_agenda_item.persons))
+        weeknr = current_agenda_item.weeknr
+        for person in self.Volunteers.search(current_agenda_item.persons):
+            shifts_per_weeks = (person.shifts_per_weeks.shifts,
+                                person.shifts_per_weeks.per_weeks)
+            if (shifts_per_weeks in ((3, 2), (2, 3), (1, 2))
+                    and person.availability_counter == 1):
+                bit = self.availability.bits[person.name]
+                self.availability.block_week(weeknr, bit)
+                if shifts_per_weeks in ((2, 3), (1, 2)):
+                    self.availability.block_week(weeknr + 1, bit)
+                    if not self.agenda.items_in_week(weeknr + 1):
+                        # The next week is in the next quarter
+                        self.not_available_next_quarter.add(person.name)
+            self._update_counter_bits(person)
+
+    def fork(self):
+        """Fork like Scheduler.fork(), and copy the availability masks.
+        """
+        fork = super().fork()
+        fork.availability = self.availability.fork()
+        fork._scheduled_2_times_masks = dict(self._scheduled_2_times_masks)
+        return fork
+
+    def _make_not_available(self, name, ag_items):
+        bit = self.availability.bits[name]
+        for ag_item in ag_items:
+            self.availability.block_date(ag_item.date, bit)
+
+    def _update_weekend_counter(self):
+        super()._update_weekend_counter()
+        self._rebuild_counter_masks()
+
+    def _reset_availability_counter(self, currentweek):
+        super()._reset_availability_counter(currentweek)
+        self._rebuild_counter_masks()
+
+
+class CpSatScheduler(Scheduler):
+    """CpSatScheduler schedules the volunteers with a constraint model
+    (see solver.py) instead of the greedy choices of Scheduler.
+    It minimises the number of unscheduled shifts within time_limit.
+    The agenda and the reports are the same as those of Scheduler.
+    The whole agenda is solved at once, so schedule_volunteers()
+    has no <until>.
+
+    Attributes:
+        time_limit: (int)
+            Maximum number of seconds for the solver.
+        workers: (int)
+            Number of search workers of the solver, None for 
+            the number of cores. With one worker the same seed 
+            gives the same schedule (see solver.solve()).
+        status: (string)
+            Status of the solver after scheduling, 
+            'OPTIMAL', 'FEASIBLE' (time_limit reached) or
+            'UNKNOWN' (time_limit reached before the solver found
+            a schedule). Without a schedule of the solver, or with 
+            a worse one, the schedule of Scheduler is used.
+    """
+    def __init__(self, year, quarter, version, agenda, volunteers,
+                 time_limit=60, workers=None, **kwargs):
+        super().__init__(year, quarter, version, agenda, volunteers, 
+                         **kwargs)
+        self.time_limit = time_limit
+        self.workers = workers
+        self.status = ''
+
+    def schedule_volunteers(self):
+        """Fill each item in the agenda with a caretaker
+        and a generalist found by the solver.
+        """
+        fallback = self._greedy_schedule()
+        self.status = solver.solve(self.agenda, self.Volunteers, 
+                                   self.holydays, self.time_limit,
+                                   seed=self.random.randrange(2**31),
+                                   carried_over_dates=self.carried_over_dates,
+                                   carried_over_counters=(
+                                       self.carried_over_counters),
+                                   fallback=fallback, workers=self.workers)
+        self._count_week_shifts()
+        self._update_counters()
+        self.scheduled_items = len(self.agenda.items)
+
+    def _update_counters(self):
+        """Update the counters of the persons and 
+        not_available_next_quarter for the solved agenda, 
+        as Scheduler.schedule_volunteers() does while it schedules,
+        so that quarter_state() continues with them.
+        """
+        for agenda_item in self.agenda.items:
+            if agenda_item.weeknr != self.currentweek:
+                self.currentweek = agenda_item.weeknr
+                self._reset_availability_counter(self.currentweek)
+                self._update_weekend_counter()
+            self._reset_weekend_counter(agenda_item)
+            self._update_availability_counter(agenda_item)
+            self._update_persons_not_available(agenda_item)
+
+    def _greedy_schedule(self):
+        """Return the (name, index of agenda item) of the shifts
+        of Scheduler.schedule_volunteers() in a fork that keep 
+        the rules (see rules.RuleCheck), the schedule if the solver
+        finds none within time_limit.
+        """
+        greedy = self.fork()
+        Scheduler.schedule_volunteers(greedy)
+        check = rules.RuleCheck(self.agenda, self.Volunteers, self.holydays,
+                                self.carried_over_dates,
+                                self.carried_over_counters)
+        schedule = set()
+        for index, ag_item in enumerate(greedy.agenda.items):
+            for name in ag_item.persons:
+                if name and check.can_take(name, index):
+                    check.add(name, index)
+                    schedule.add((name, index))
+        return schedule
+
+
+SCHEDULERS = {'sets': Scheduler, 'bitset': BitsetScheduler, 
+              'cpsat': CpSatScheduler}
+
+
+def write_agendas_to_xlsx_file(schedulers, filename):
+    """Write the agenda of each Scheduler in <schedulers> to its own
+    sheet of the .xlsx file <filename>.
+    The workbook is in write-only mode: the rows are streamed to disk,
+    so many agendas (a year, or several locations) fit in one workbook
+    without keeping all cells in memory.
+    """
+    wb = Workbook(write_only=True)
+    for scheduler in schedulers:
+        export.export_agenda(scheduler, [export.XlsxRenderer(workbook=wb)])
+    wb.save(filename)
+    print(f'Bestand opgeslagen: {filename}')
+
+
+def schedule_with_seed(seed, year, quarter, version, volunteers, engine,
+                       state=None, time_limit=60):
+    """Make a schedule with the random generator seeded with <seed>,
+    continuing from the carryover.QuarterState <state> if given.
+    <time_limit> is the maximum number of seconds of the cpsat engine.
+    Return the Score of the schedule.
+    Note: scheduling changes the counters of the persons in <volunteers>,
+    so each call needs its own copy (as it gets in a worker process).
+    """
+    agenda = init_agenda.Agenda(year=year, quarter=quarter)
+    if engine == 'cpsat':
+        # One search worker per process, and the same schedule
+        # for the same seed
+        scheduler = CpSatScheduler(year, quarter, version, agenda, 
+                                   volunteers, time_limit=time_limit,
+                                   workers=1, seed=seed)
+    else:
+        scheduler = SCHEDULERS[engine](year, quarter, version, agenda, 
+                                       volunteers, seed=seed)
+    if state is not None:
+        scheduler.carry_over(state)
+    scheduler.schedule_volunteers()
+    return scheduler.score()
+
+
+def search_best_seed(seeds, year, quarter, version, volunteers, engine,
+                     state=None, time_limit=60):
+    """Make a schedule for each seed in <seeds> in a pool of processes.
+    Return the best (lowest) score and its seed. 
+    The first seed wins between equal scores.
+    """
+    seeds = list(seeds)
+    count = len(seeds)
+    with ProcessPoolExecutor() as executor:
+        scores = executor.map(schedule_with_seed, seeds,
+            [year] * count, [quarter] * count, [version] * count,
+            [volunteers] * count, [engine] * count, [state] * count,
+            [time_limit] * count)
+        # min() returns the first of equal scores.
+        best_score, best_seed = min(zip(scores, seeds),
+                                    key=lambda result: result[0])
+    return best_seed, best_score
+
+
+def load_schedule(filename, engine='sets'):
+    """Return a Scheduler of <engine> with the scheduled agenda 
+    and the volunteers saved in <filename> (see snapshot.py).
+    The sourcefile is not read and nothing is scheduled.
+    """
+    saved = snapshot.load(filename)
+    volunteers = init_volunteers.Volunteers(saved.sourcefilename,
+                                            persons=saved.persons)
+    agenda = init_agenda.Agenda(year=saved.year, quarter=saved.quarter)
+    if not (len(agenda.items) == len(saved.caretakers)
+            == len(saved.generalists)):
+        raise exceptions.SnapshotError(
+            f'De planning in {filename!r} past niet in de agenda van '
+            f'het {saved.quarter}e kwartaal {saved.year}')
+    scheduler = SCHEDULERS[engine](saved.year, saved.quarter, saved.version,
+                                   agenda, volunteers)
+    scheduler.random.setstate(saved.random_state)
+    for ag_item, caretaker, generalist in zip(
+            agenda.items, saved.caretakers, saved.generalists):
+        ag_item.persons = [caretaker, generalist]
+    scheduler._count_week_shifts()
+    scheduler.not_available_next_quarter = (
+        saved.not_available_next_quarter)
+    scheduler.carried_over_dates = saved.carried_over_dates
+    scheduler.carried_over_counters = saved.carried_over_counters
+    scheduler.scheduled_items = len(agenda.items)
+    return scheduler
+
+
+def load_quarter_state(filename):
+    """Return the carryover.QuarterState in <filename>: the state 
+    in a .json file, or the state at the end of a saved schedule.
+    """
+    if Path(filename).suffix == '.json':
+        return carryover.load(filename)
+    return load_schedule(filename).quarter_state()
 
 
 def file_exists(filename, extension):
@@ -629,36 +1157,174 @@ def file_exists(filename, extension):
         return False
 
 
-def main(args):
-    year = args.year
-    quarter = args.quarter
+def schedule_quarter(args, year, quarter, volunteers, state=None,
+                     outfilename=None):
+    """Make the schedule of <year> <quarter> with the options in <args>,
+    continuing from the carryover.QuarterState <state> if given.
+    Write the schedule to the output files <outfilename> with
+    the extension of each format, and return the Scheduler.
+    """
     version = args.version
-    input_filename = args.filename
     agenda = init_agenda.Agenda(year=year, quarter=quarter)
-    volunteers = init_volunteers.Volunteers(input_filename)
-    scheduler = Scheduler(year, quarter, version, agenda, volunteers) 
+
+    lower_bound = None
+    if args.check:
+        # Which shifts no schedule can fill, before scheduling
+        result = feasibility.check(agenda, volunteers,
+                                   holyday.determine_holydays(year))
+        print(f'Controle {quarter}e kwartaal {year}:')
+        for line in feasibility.report_lines(result):
+            print(line)
+        lower_bound = sum(feasibility.lower_bound(result))
+
+    seed = args.seed
+    if args.runs > 1:
+        # Search the best of several schedules,
+        # and make that schedule (again) here.
+        first_seed = seed or 0
+        seed, score = search_best_seed(
+            range(first_seed, first_seed + args.runs), 
+            year, quarter, version, volunteers, args.engine, state,
+            args.time_limit)
+        print(f'Beste van {args.runs} planningen: seed {seed}, '
+              f'ongeplande diensten: {score.unscheduled_shifts}, '
+              f'niet ingeplande vrijwilligers: {score.unused_volunteers}, '
+              f'niet in het weekend: {score.not_in_weekend}')
+    if args.engine == 'cpsat':
+        # After a search of the best seed, one search worker
+        # makes the schedule of that seed again.
+        scheduler = CpSatScheduler(year, quarter, version, agenda, 
+                                   volunteers, time_limit=args.time_limit,
+                                   workers=1 if args.runs > 1 else None,
+                                   seed=seed)
+    else:
+        scheduler = SCHEDULERS[args.engine](
+            year, quarter, version, agenda, volunteers, seed=seed)
+    if state is not None:
+        scheduler.carry_over(state)
     
     # Start scheduling!
     scheduler.schedule_volunteers()
+    if args.engine == 'cpsat':
+        print(f'Solver status: {scheduler.status}')
+        if scheduler.status == 'UNKNOWN':
+            print(f'Geen planning van de solver binnen {args.time_limit} '
+                  f'seconden, de planning van de sets planner is gebruikt')
+    if args.repair or args.repair_iterations:
+        # Fill empty shifts with a local search
+        unscheduled = scheduler.score().unscheduled_shifts
+        iterations = repair.Repair(scheduler, rng=scheduler.random).run(
+            max_seconds=args.repair or None,
+            max_iterations=args.repair_iterations)
+        print(f'Reparatie: {iterations} stappen, ongeplande diensten '
+              f'{unscheduled} -> {scheduler.score().unscheduled_shifts}')
     if args.verbose:
         volunteers.show_count()
     
-    outfilename = ('./hospice ' 
-                   + str(quarter) + 'e kwartaal ' 
-                   + str(year) 
-                   + ' v. ' + str(version))
+    if outfilename is None:
+        outfilename = ('./hospice ' 
+                       + str(quarter) + 'e kwartaal ' 
+                       + str(year) 
+                       + ' v. ' + str(version))
     # if file_exists(outfilename, '.csv'):
     #    exit()
-    scheduler.write_agenda_to_txt_file(outfilename + '.txt')
-    scheduler.write_agenda_to_csv_file(outfilename + '.csv')
+    # All formats in one pass over the agenda
+    export.export_agenda(scheduler, [
+        export.RENDERERS[extension](f'{outfilename}.{extension}')
+        for extension in args.formats])
+    # The schedule itself, to read it back later
+    snapshot.save(snapshot.from_scheduler(scheduler), 
+                  outfilename + '.planning')
     
     scheduler.not_scheduled_shifts()
+    if lower_bound is not None:
+        by_scheduler = scheduler.score().unscheduled_shifts - lower_bound
+        print(f'Daarvan minstens {lower_bound} door een tekort aan '
+              f'vrijwilligers, dus hoogstens {by_scheduler} door de planner')
     
     if args.verbose:
         scheduler.persons_not_scheduled()
         scheduler.persons_not_scheduled_in_weekend()
+    return scheduler
+
+
+def draw_seed(args):
+    """Draw a seed if <args> has none, and show it,
+    so that the run can be repeated with --seed.
+    """
+    if args.seed is None:
+        args.seed = random.randrange(1_000_000)
+        print(f'Seed: {args.seed} (herhaal deze planning met '
+              f'--seed {args.seed})')
+
+
+def main(args):
+    draw_seed(args)
+    volunteers = init_volunteers.Volunteers(args.filename, 
+                                            use_cache=not args.no_cache)
+    state = None
+    if args.state:
+        # Continue where the previous quarter stopped
+        state = load_quarter_state(args.state)
+
+    # Each quarter continues with the state of the quarter before it
+    schedulers = []
+    for year, quarter in carryover.next_quarters(
+            args.year, args.quarter, args.quarters):
+        scheduler = schedule_quarter(args, year, quarter, volunteers, state)
+        state = scheduler.quarter_state()
+        schedulers.append(scheduler)
+
+    if len(schedulers) > 1 and 'xlsx' in args.formats:
+        # All quarters in one workbook, a sheet per quarter
+        write_agendas_to_xlsx_file(schedulers, 
+            f'./hospice {args.quarters} kwartalen vanaf {args.quarter}e '
+            f'kwartaal {args.year} v. {args.version}.xlsx')
+
+    if args.save_state:
+        carryover.save(state, args.save_state)
     
 
+def add_schedule_options(parser):
+    """Add the options of schedule_quarter() to the
+    argparse.ArgumentParser <parser>.
+    """
+    parser.add_argument('-e', '--engine', 
+        help='hoe de planning wordt gemaakt (standaard: sets)',
+        choices=SCHEDULERS.keys(), default='sets')
+    parser.add_argument('-t', '--time-limit', 
+        help='maximaal aantal seconden voor de cpsat planner (standaard: 60)',
+        type=int, default=60)
+    parser.add_argument('--repair', 
+        help='verbeter de planning zoveel seconden met een lokale zoektocht',
+        type=float, default=0)
+    parser.add_argument('--repair-iterations', 
+        help='verbeter de planning met zoveel stappen van een lokale '
+             'zoektocht; met --seed is het resultaat steeds hetzelfde',
+        type=int, default=None)
+    parser.add_argument('-s', '--seed', 
+        help='start van de random generator; dezelfde seed en hetzelfde '
+             'bestand geven dezelfde planning (standaard: een willekeurige '
+             'seed, die wordt getoond)',
+        type=int, default=None)
+    parser.add_argument('-r', '--runs', 
+        help='maak zoveel planningen (parallel) en bewaar de beste',
+        type=int, default=1)
+    parser.add_argument('-f', '--formats', 
+        help='de bestanden van de planning (standaard: txt csv xlsx)',
+        choices=export.RENDERERS.keys(), nargs='+', 
+        default=['txt', 'csv', 'xlsx'])
+    parser.add_argument('-c', '--check', 
+        help='bereken vooraf hoeveel diensten zeker niet te vullen zijn',
+        action='store_true')
+    parser.add_argument('--no-cache', 
+        help='lees het bestand opnieuw, ook als het niet is veranderd',
+        action='store_true')
+    parser.add_argument('-v', '--verbose', 
+        help='More information about results of scheduling',
+        action='store_true')
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         description='Agenda planner voor hospice, Rijssen',
@@ -674,10 +1340,19 @@ if __name__ == '__main__':
     parser.add_argument('version', 
         help='welke versie', type=int)
     parser.add_argument("filename", 
-        help='csv bestand met vrijwillergersgegevens')
-    parser.add_argument('-v', '--verbose', 
-        help='More information about results of scheduling',
-        action='store_true')
+        help='bestand met vrijwillergersgegevens (.xlsx, .csv, .parquet, '
+             '.feather)')
+    parser.add_argument('-q', '--quarters', 
+        help='plan zoveel opeenvolgende kwartalen (standaard: 1)',
+        type=int, default=1)
+    parser.add_argument('--state', 
+        help='.json bestand met de stand aan het eind van het vorige '
+             'kwartaal (zie --save-state), of de .planning van '
+             'het vorige kwartaal')
+    parser.add_argument('--save-state', 
+        help='bewaar de stand aan het eind van het (laatste) kwartaal '
+             'in dit .json bestand')
+    add_schedule_options(parser)
     args = parser.parse_args()
     
     if args.verbose:
@@ -1,11 +1,10 @@
 """Initialise the agenda for all days of 
 a chosen year and quarter.
 """
+from bisect import bisect_left
+from bisect import bisect_right
 from datetime import date as Date
 from datetime import timedelta
-from datetime import datetime
-
-import const
 
 
 class Planningelement:
@@ -24,17 +23,61 @@ class Planningelement:
             isoweekday. 1 = monday
         persons: (list)
             person names scheduled for this shift. Maximum is 2.
-        persons_not_available: (set)
+        persons_not_available: (set, read-only)
             set of person names not available for this shift.
+            Add a name with add_not_available(): the set is made when
+            it is first needed, so an agenda of a scheduler that doesn't
+            use the sets (e.g. the bitset and cpsat engines) has
+            no empty sets, and it is shared with the forks of the item
+            until one of them changes it (see fork()).
     """
+    # An agenda has a Planningelement per shift, so no __dict__ per item.
+    __slots__ = ('date', 'shift', 'weeknr', 'weekday', 'persons',
+                 '_persons_not_available', '_shared')
+
     def __init__(self):
         self.date = 'date_object'
         self.shift = 0
         self.weeknr = 0
         self.weekday = 0
         self.persons = []           
-        self.persons_not_available = set()  
-        
+        self._persons_not_available = None
+        # True if _persons_not_available is shared with a fork
+        self._shared = False
+
+    @property
+    def persons_not_available(self):
+        if self._persons_not_available is None:
+            return frozenset()
+        return self._persons_not_available
+
+    def add_not_available(self, name):
+        """Add the person <name> to persons_not_available.
+        """
+        if self._persons_not_available is None:
+            self._persons_not_available = set()
+        elif self._shared:
+            # Copy on write
+            self._persons_not_available = set(self._persons_not_available)
+            self._shared = False
+        self._persons_not_available.add(name)
+
+    def fork(self):
+        """Return a copy of the item, that can be changed
+        without changing this item. The persons_not_available
+        are copied only when one of both items changes them.
+        """
+        element = Planningelement.__new__(Planningelement)
+        element.date = self.date
+        element.shift = self.shift
+        element.weeknr = self.weeknr
+        element.weekday = self.weekday
+        element.persons = list(self.persons)
+        element._persons_not_available = self._persons_not_available
+        self._shared = element._shared = (
+            self._persons_not_available is not None)
+        return element
+
     def __repr__(self):
         return (
             f"date: {self.date}, "
@@ -42,7 +85,8 @@ class Planningelement:
             f"weekday: {self.weekday}, "
             f"shift: {self.shift}, "
             f"persons: {self.persons}, "
-            f"persons_not_available: {self.persons_not_available}"
+            f"persons_not_available: "
+            f"{self._persons_not_available or set()}"
         )
 
 
@@ -56,38 +100,101 @@ class Agenda:
             The quarter of the year.
         items: (list)
             Instances of Planningelement for a quarter of a year. 
+        items_by_date: (dict)
+            key=date_object, value = list of Planningelement on that date.
+        items_by_weeknr: (dict)
+            key=(int) weeknr, value = list of Planningelement in that week.
+        items_by_weekday_and_shift: (dict)
+            key=((int) weekday, (int) shift),
+            value = list of Planningelement on that weekday and shift.
+        week_positions: (dict)
+            key=(int) weeknr, value = (int) position of the week
+            in the agenda, 0 for the first week.
     """
     def __init__(self, year, quarter):
         self.year = year
         self.quarter = quarter
         self.items = self._initialize()  # planningelementlist
+        self._build_indexes()
         
+    def fork(self):
+        """Return a copy of the agenda, e.g. to try an alternative
+        for the rest of a partly scheduled agenda.
+        The fork has its own items (see Planningelement.fork()),
+        so scheduling in the fork doesn't change this agenda.
+        """
+        agenda = Agenda.__new__(Agenda)
+        agenda.year = self.year
+        agenda.quarter = self.quarter
+        agenda.items = [ag_item.fork() for ag_item in self.items]
+        agenda._build_indexes()
+        return agenda
+
+    def items_on_date(self, date):
+        """Return the planningelements of <date>
+        (an empty list if the date is not in the agenda).
+        """
+        return self.items_by_date.get(date, [])
+
+    def items_in_week(self, weeknr):
+        """Return the planningelements of week <weeknr>
+        (an empty list if the week is not in the agenda).
+        """
+        return self.items_by_weeknr.get(weeknr, [])
+
+    def items_in_timespan(self, startdate, enddate):
+        """Return the planningelements from <startdate> up to and
+        including <enddate>. Only the part of the timespan 
+        that is in the agenda counts, so a long timespan costs 
+        no more than the planningelements found.
+        """
+        # self.items is sorted on date, so the planningelements
+        # of the timespan are a slice of self.items.
+        start = bisect_left(self._item_dates, startdate)
+        end = bisect_right(self._item_dates, enddate)
+        return self.items[start:end]
+
+    def index_of(self, ag_item):
+        """Return the position of <ag_item> in self.items.
+        """
+        return self._item_positions[id(ag_item)]
+
+    def items_on_weekday_and_shift(self, weekday, shift):
+        """Return the planningelements with <weekday> and <shift>.
+        """
+        return self.items_by_weekday_and_shift.get((weekday, shift), [])
+
     def searchitems(self, weekday=None, shift=None, timespan=None):
         """Search instances of Planningelement.
         Yield the found planningelements one at a time.
         """
         if weekday and shift:
-            for ag_item in self.items:
-                if ag_item.shift == shift and ag_item.weekday == weekday:
-                    yield ag_item
+            yield from self.items_on_weekday_and_shift(weekday, shift)
 
         if timespan:
-            dates = timespan.split('>') 
-            if len(dates) > 1:
-                startdate = datetime.strptime(dates[0], 
-                            const.DATEFORMAT).date()
-                enddate = datetime.strptime(dates[1], 
-                          const.DATEFORMAT).date()
-            else:
-                enddate = startdate = datetime.strptime(dates[0], 
-                                      const.DATEFORMAT).date()
-                
-            currentdate = startdate
-            while currentdate <= enddate:
-                for ag_item in self.items:
-                    if ag_item.date == currentdate:
-                        yield ag_item
-                currentdate = currentdate + timedelta(days=1)  # Next date
+            # timespan is a (startdate, enddate) tuple of date_objects
+            yield from self.items_in_timespan(*timespan)
+
+    def _build_indexes(self):
+        """Index self.items on date, weeknr, (weekday, shift)
+        and position, so that lookups don't have to scan the whole agenda.
+        The planningelements keep the order of self.items.
+        """
+        self._item_dates = [ag_item.date for ag_item in self.items]
+        self._item_positions = {}
+        self.items_by_date = {}
+        self.items_by_weeknr = {}
+        self.items_by_weekday_and_shift = {}
+        for index, ag_item in enumerate(self.items):
+            self._item_positions[id(ag_item)] = index
+            self.items_by_date.setdefault(
+                ag_item.date, []).append(ag_item)
+            self.items_by_weeknr.setdefault(
+                ag_item.weeknr, []).append(ag_item)
+            self.items_by_weekday_and_shift.setdefault(
+                (ag_item.weekday, ag_item.shift), []).append(ag_item)
+        self.week_positions = {weeknr: position for position, weeknr
+                               in enumerate(self.items_by_weeknr)}
         
     def _initialize(self):
         """Create a list of instances of class Planningelement 
@@ -119,7 +226,9 @@ class Agenda:
         find the first date that *is* a monday,
         going back if method = 'before'
         and going forward if method is 'after'.
-        And m.m. for the last day of the quarter.
+        And m.m. for the first day of the next quarter: the last day
+        of the quarter is the day before it, so consecutive quarters
+        have no gap between them, also if a quarter ends on a monday.
         """
         quarter_end_date = [(3, 31), (6, 30), (9, 30), (12, 31)] 
         quarter_start_date = [(1, 1), (4, 1), (7, 1), (10, 1)] 
@@ -131,7 +240,8 @@ class Agenda:
         
         month = quarter_end_date[quarter][0]
         day = quarter_end_date[quarter][1]
-        endday = Date(year, month, day)
+        # The first day of the next quarter
+        endday = Date(year, month, day) + timedelta(days=1)
         
         if method == 'after':
             operator = 1  # Add a day
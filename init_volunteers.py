@@ -1,14 +1,183 @@
-from collections import Counter
 from collections import namedtuple
+import csv
 from datetime import datetime
+from datetime import timedelta
+from functools import lru_cache
+import hashlib
+import os
+from pathlib import Path
+import pickle
 import re
-from types import SimpleNamespace
 
 from openpyxl import load_workbook
 
+try:
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
 import const
 import exceptions
 
+# The column names of the sourcefile.
+ALLOWED_HEADERS = ('Service', 'Achternaam', 'Voornaam', 'Tussenv', 
+        'Actief', 'DienstenPerAantalWeken', 'NietOpDagEnDienst', 
+        'VoorkeurDagEnDienst', 'NietInPeriode', 'VoorkeurTekst', 
+        'NietSamenMet')
+# The column names that the sourcefile must have.
+REQUIRED_HEADERS = ALLOWED_HEADERS[:-2]
+
+SERVICES = ('verzorger', 'algemeen')
+
+# The patterns of the values in the sourcefile, compiled once.
+# A day_and_shifts string (without spaces) is
+# weekday + ':'
+#   + comma seperated shiftnumber e.g (1,2,3,4) or (1,2) or (3)
+# and then an endless repetition of
+#   '#' + (the first part, ending with '#').
+# Example: ma:1,2,3,4#di:1,2,3#zo:4#
+DAY_AND_SHIFTS_PATTERN = re.compile(
+    r'^(((ma|di|wo|do|vr|za|zo)[:][1-4]([,][1-4])*)[#])*$')
+# shifts_per_weeks must be like 1,2 or 3,2 or ...
+SHIFTS_PER_WEEKS_PATTERN = re.compile(r'^(1,1|1,2|3,2|2,1|2,3)$')
+
+# On how many shifts in how many weeks a person wants to be scheduled.
+ShiftsPerWeeks = namedtuple('ShiftsPerWeeks', ('shifts', 'per_weeks'))
+
+
+@lru_cache(maxsize=None)
+def parse_date(text):
+    """Return the date_object of <text> in const.DATEFORMAT.
+    The same dates are found in many rows, so each text is parsed once.
+    """
+    return datetime.strptime(text, const.DATEFORMAT).date()
+
+
+@lru_cache(maxsize=None)
+def shifts_per_weeks(shifts, per_weeks):
+    """Return ShiftsPerWeeks(<shifts>, <per_weeks>).
+    There are only a few variants, so the persons share them.
+    """
+    return ShiftsPerWeeks(shifts, per_weeks)
+
+
+@lru_cache(maxsize=None)
+def parse_day_and_shifts(text):
+    """Return the dict of the day_and_shifts string <text>
+    (without spaces), see Volunteers._parse_day_and_shifts().
+    Raise ValueError if <text> is not valid.
+    Many persons have the same text, so each text is parsed once
+    and the persons share the dict: it must not be changed.
+    """
+    if not text:
+        return {}
+    # The string must end with a '#'
+    if not text.endswith('#') or not DAY_AND_SHIFTS_PATTERN.match(text):
+        raise ValueError(text)
+
+    # Make a list of items in the string 
+    # with delimiter = '#':
+    # e.g. ['ma:1,2,3,4', 'wo:3,4', 'zo:4'] 
+    result_dict = {}
+    for item in text.strip('#').split('#'):
+        weekday, shifts = item.split(":")
+        # Make a dict with key = isoweekday number
+        # and value = tuple of shifts.
+        shifts = tuple(int(i) for i in shifts.split(","))
+        if len(set(shifts)) != len(shifts):
+            raise ValueError(text)
+        result_dict[const.WEEKDAY_LOOKUP[weekday]] = shifts
+    return result_dict
+
+
+def merge_timespans(timespans):
+    """Return <timespans>, a list of (startdate, enddate) tuples,
+    sorted on startdate and with the overlapping and adjoining 
+    timespans merged into one.
+    """
+    merged = []
+    for startdate, enddate in sorted(timespans):
+        if merged and startdate <= merged[-1][1] + timedelta(days=1):
+            if enddate > merged[-1][1]:
+                merged[-1] = (merged[-1][0], enddate)
+        else:
+            merged.append((startdate, enddate))
+    return tuple(merged)
+
+
+def read_xlsx_rows(sourcefile):
+    """Yield the rows of the columns J to T of the .xlsx file <sourcefile>.
+    The workbook is read in read-only mode, 
+    which streams the rows instead of loading all cells at once.
+    """
+    wb = load_workbook(filename=sourcefile, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        min_col = 10
+        max_col = min_col + 10  # Read eleven(!) columns
+        yield from ws.iter_rows(min_col=min_col,
+                max_col=max_col, values_only=True)
+    finally:
+        # A read-only workbook keeps the file open until closed
+        wb.close()
+
+
+def _select_columns(headers):
+    """Return the positions of the ALLOWED_HEADERS in <headers>.
+    """
+    return [position for position, header in enumerate(headers)
+            if header in ALLOWED_HEADERS]
+
+
+def read_csv_rows(sourcefile):
+    """Yield the rows of the .csv file <sourcefile>, one at a time.
+    The columns are found by name, other columns are skipped.
+    The delimiter is const.CSV_DELIMITER.
+    """
+    with open(sourcefile, newline='', encoding='UTF-8') as f:
+        reader = csv.reader(f, delimiter=const.CSV_DELIMITER)
+        headers = next(reader, ())
+        positions = _select_columns(headers)
+        yield tuple(headers[position] for position in positions)
+        for row in reader:
+            yield tuple(row[position] if position < len(row) else None
+                        for position in positions)
+
+
+def read_columnar_rows(sourcefile):
+    """Yield the rows of the Parquet or Feather (Arrow) file <sourcefile>.
+    The columns with a name in ALLOWED_HEADERS are loaded at once 
+    as columns and then zipped into rows.
+    """
+    if pyarrow is None:
+        raise ModuleNotFoundError(
+            'Voor Parquet en Feather bestanden is pyarrow nodig: '
+            'pip install pyarrow')
+    if str(sourcefile).lower().endswith('.parquet'):
+        schema = pyarrow.parquet.read_schema(sourcefile)
+        headers = [schema.names[i] for i in _select_columns(schema.names)]
+        table = pyarrow.parquet.read_table(sourcefile, columns=headers)
+    else:
+        table = pyarrow.feather.read_table(sourcefile)
+        headers = [table.column_names[i] 
+                   for i in _select_columns(table.column_names)]
+    yield tuple(headers)
+    yield from zip(*(table.column(header).to_pylist() 
+                     for header in headers))
+
+
+# key=file extension, value = function that yields the rows of a 
+# sourcefile. The first row has the column names.
+READERS = {
+    '.xlsx': read_xlsx_rows,
+    '.xlsm': read_xlsx_rows,
+    '.csv': read_csv_rows,
+    '.parquet': read_columnar_rows,
+    '.feather': read_columnar_rows,
+    '.arrow': read_columnar_rows,
+}
+
 
 class Person:
     """A Person is a human being.
@@ -19,18 +188,24 @@ class Person:
         service: (string)
             Each shift needs a service 'verzorger' and a service 'algemeen'
             so we need to know wich type of service a person provides.
-        shifts_per_weeks: (SimpleNamespace) shifts=int per_weeks=int
+        shifts_per_weeks: (ShiftsPerWeeks) shifts=int per_weeks=int
             On how many shifts in how many weeks the person
             wants to be scheduled.
         not_on_shifts_per_weekday: (dict)
             On which weekday on which shifts a person is not willing to work.
             key=(int) weekday, value = tuple of (int) shift
-        not_in_timespan: (tuple)(date_object)[>(date_object)]
+            Persons with the same text in the sourcefile share the dict
+            (see parse_day_and_shifts()), so it is never changed.
+        not_in_timespan: (tuple)
             On which days of the year quarter the person 
             doesn't want to be scheduled.
+            A tuple of (startdate, enddate) date_objects,
+            startdate == enddate for a single day.
+            The timespans are sorted and don't overlap.
         preferred_shifts: (dict)
             Some volunteers prefer to be scheduled on a specific day and shift.
             key=(int) weekday, value = tuple of (int) shift
+            Shared like not_on_shifts_per_weekday.
         availability_counter: (int)
             The number of times that the person 
             is available for scheduling per one or more weeks.
@@ -49,6 +224,13 @@ class Person:
             the counter is incremented by 1. While the counter is not yet 4,
             the person is not available for scheduling in the weekend.
     """
+    # No __dict__ per person: a sourcefile can have thousands of persons,
+    # and each job of batch.py has its own copy of them.
+    __slots__ = ('name', 'service', 'shifts_per_weeks',
+                 'not_on_shifts_per_weekday', 'not_on_shifts_count',
+                 'preferred_shifts', 'not_in_timespan',
+                 'availability_counter', 'weekend_counter')
+
     def __init__(self):
         self.name = "" 
         self.service = ""
@@ -60,6 +242,15 @@ class Person:
         self.availability_counter = 0 
         self.weekend_counter = 4
 
+    def copy(self):
+        """Return a copy of the person with its own counters.
+        The preferences are shared, they don't change.
+        """
+        person = Person.__new__(Person)
+        for attribute in Person.__slots__:
+            setattr(person, attribute, getattr(self, attribute))
+        return person
+
     def __repr__(self):
         return (
             f'{self.name}, '
@@ -85,39 +276,67 @@ class Volunteers:
             A set of person names who's service is generalist.
         caretaker_names: (set)
             A set of person names who's service is caretaking.
+        persons_by_name: (dict)
+            key=(string) name, value = instance of Person.
+        persons_by_service: (dict)
+            key=(string) service, value = dict of name: Person
+            of the persons with that service.
+        persons_by_shifts_per_weeks: (dict)
+            key=((int) shifts, (int) per_weeks), value = dict of 
+            name: Person of the persons with that shifts_per_weeks.
+        cachefilename: (Path)
+            The file in const.CACHE_DIR with the persons read from
+            the sourcefile, or None if the cache is not used.
     """
-    def __init__(self, sourcefilename):
+    def __init__(self, sourcefilename, use_cache=True, persons=None):
 
         self.sourcefilename = sourcefilename
-        print(f'\nBestand lezen: "{self.sourcefilename}"...\n')
-
         # self.persons is a tuple with instances of class 'Person'
-        self.persons = self._read_volunteersfile(self.sourcefilename)
-        self._check_sanity("duplicate_names")
+        self.cachefilename = None
+        self.persons = None
+        if persons is not None:
+            # The persons are known already (see snapshot.py),
+            # the sourcefile is not read.
+            self.persons = tuple(persons)
+        else:
+            print(f'\nBestand lezen: "{self.sourcefilename}"...\n')
+            if use_cache:
+                self.cachefilename = self._cachefilename(
+                    self.sourcefilename)
+                self.persons = self._read_cache(self.cachefilename)
+            if self.persons is None:
+                self.persons = self._read_volunteersfile(
+                    self.sourcefilename)
+                if use_cache:
+                    self._write_cache(self.cachefilename)
+        self._build_registry()
 
         # Get all 'generic' workers and all 'caretaker' workers.
         # Note: we use set operators on these groups and
         # the set operator 'difference' doesn't work on lists.
         # So we convert the list to a tuple and then to a set.
-        self.generalist_names = set(tuple([
-            p.name
-            for p in self.persons
-            if p.service == 'algemeen']))
-        self.caretaker_names = set(tuple([ 
-            p.name
-            for p in self.persons
-            if p.service == 'verzorger']))
+        self.generalist_names = set(
+            self.persons_by_service['algemeen'].keys())
+        self.caretaker_names = set(
+            self.persons_by_service['verzorger'].keys())
+
+    def fork(self):
+        """Return a copy of the volunteers with their own instances
+        of Person, so the counters of the copy can change without
+        changing these persons. The preferences are shared,
+        they don't change while scheduling.
+        """
+        volunteers = Volunteers(self.sourcefilename,
+                                persons=[p.copy() for p in self.persons])
+        volunteers.cachefilename = self.cachefilename
+        return volunteers
 
     def search(self, namelist):
         """returns a list of instances of Person that have
         a matching name in namelist.
         """
-        result = []
-        for name in namelist:
-            for person in self.persons:
-                if person.name == name:
-                    result.append(person)
-        return result
+        return [self.persons_by_name[name] for name in namelist
+                if name in self.persons_by_name]
     
     def get_optimal_person(self, namelist):
         """Return the person name who has the highest
@@ -130,16 +349,31 @@ class Volunteers:
         availability, so we save them for a shift in 
         the future.
         """
-        shiftcount = 0
-        persons = [person for person in self.persons
-                   if person.name in namelist]
-        for person in persons:
-            if (person.not_on_shifts_count >= shiftcount):
-                # Choose the more or equal optimal person
-                shiftcount = person.not_on_shifts_count
-                personname = person.name
-        return personname
+        # The position in self.persons decides between persons
+        # with an equal shiftcount: the last one found wins.
+        person = max(self.search(namelist),
+                     key=lambda p: (p.not_on_shifts_count,
+                                    self._position[p.name]))
+        return person.name
             
+    def _build_registry(self):
+        """Index the persons on name, on service and on shifts_per_weeks,
+        so that a person (or a group of persons) is found without
+        scanning all persons. Each index keeps the order of self.persons.
+        """
+        self.persons_by_name = {}
+        self.persons_by_service = {'verzorger': {}, 'algemeen': {}}
+        self.persons_by_shifts_per_weeks = {}
+        self._position = {}
+        for position, person in enumerate(self.persons):
+            self.persons_by_name[person.name] = person
+            self.persons_by_service[person.service][person.name] = person
+            key = (person.shifts_per_weeks.shifts, 
+                   person.shifts_per_weeks.per_weeks)
+            self.persons_by_shifts_per_weeks.setdefault(
+                key, {})[person.name] = person
+            self._position[person.name] = position
+
     def show_count(self):
         """report how many persons of both service categories 
         are available this quarter.
@@ -154,67 +388,88 @@ class Volunteers:
         for p in self.persons:
             print(p)
 
-    def _day_and_shifts_to_dict(self,
-            day_and_shifts_string, columnname, line_num):
-        """The day_and_shifts_string is 
-        for example 'ma:1, 2,3,4#  wo:3,4 # zo:4.'
-        The function returns the dict: { 1: (1,2,3,4), 3: (3,4), 7: (4) }
-        The weekddays are translated to isoweekday numbers,
-        and the shifts are in a tuple.
+    def _cachefilename(self, sourcefile):
+        """Return the name of the cache file for <sourcefile>.
+        The name is a hash of the contents of the sourcefile,
+        of this module and of const.py, so a changed sourcefile,
+        a changed Person or a changed constant (e.g. DATEFORMAT or
+        CSV_DELIMITER) gets a new cache file.
         """
-        if day_and_shifts_string:
-            spaceless_string = day_and_shifts_string.replace(" ", "")
-            
-            # Check the input string
-            self._check_sanity('day_and_shifts_string', spaceless_string,
-                columnname=columnname, line_num=line_num)
-            
-            # Remove the last '#' AFTER the sanity check
-            spaceless_string = spaceless_string.strip('#')
-            
-            # Make a list of items in the string 
-            # with delimiter = '#':
-            day_and_shifts_items = (i for i in spaceless_string.split('#'))
-            # day_and_shift_list is e.g. ['ma:1,2,3,4', 'wo:3,4', 'zo:4'] 
-            result_dict = {}
-            for item in day_and_shifts_items:
-                sep_weekday_and_shift = item.split(":")
-                # The first sep_weekday_and_shift is ['ma', '1,2,3,4']
-                # Now make a dict with key = isoweekday number
-                # and value = tuple of shifts.
-                key = const.WEEKDAY_LOOKUP[sep_weekday_and_shift[0]] 
-                value = (int(i) for i in sep_weekday_and_shift[1].split(","))
-                result_dict[key] = tuple(value)
-            return result_dict
-        else:
-            return {}
+        digest = hashlib.sha256()
+        digest.update(Path(__file__).read_bytes())
+        digest.update(Path(const.__file__).read_bytes())
+        with open(sourcefile, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 16), b''):
+                digest.update(block)
+        return (Path(const.CACHE_DIR).expanduser() 
+                / (digest.hexdigest() + '.pickle'))
+
+    def _read_cache(self, cachefilename):
+        """Return the tuple of persons from <cachefilename>,
+        or None if there is no (readable) cache file.
+        """
+        try:
+            with open(cachefilename, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, 
+                AttributeError, ImportError):
+            return None
+
+    def _write_cache(self, cachefilename):
+        """Write self.persons to <cachefilename>.
+        A cache that can't be written is not an error.
+        """
+        try:
+            cachefilename.parent.mkdir(parents=True, exist_ok=True)
+            tmpfilename = cachefilename.with_suffix('.tmp')
+            with open(tmpfilename, 'wb') as f:
+                pickle.dump(self.persons, f, pickle.HIGHEST_PROTOCOL)
+            # Replace at once, so a reader never sees half a file
+            os.replace(tmpfilename, cachefilename)
+        except OSError:
+            pass
 
     def _read_volunteersfile(self, sourcefile):
-        """read a prepared .xls file <sourcefile>.
+        """read a prepared sourcefile <sourcefile>
+        with the reader in READERS for the file extension.
+        Return a tuple of the instances 'Person'.
+        """
+        extension = Path(sourcefile).suffix.lower()
+        if extension not in READERS:
+            raise exceptions.InvalidSourceFileError(
+                f'Bestandstype {extension!r} kan niet gelezen worden. '
+                f'Mogelijk zijn: {", ".join(READERS)}')
+        reader = READERS[extension](sourcefile)
+        try:
+            return self._rows_to_persons(reader)
+        finally:
+            reader.close()
+
+    def _rows_to_persons(self, reader):
+        """The first row of <reader> has the column names.
         The attributes are extracted from the column names.
-        Read the values from the .xls file.
+        Read the values from the other rows.
         Assign the values to the an instance of class 'Person'.
+        All rows are checked before an error is raised, 
+        see _raise_errors().
         Return a tuple of the instances 'Person'.
         """
         volunteers = []
+        errors = []
+        names = set()
         
-        wb = load_workbook(filename=sourcefile, data_only=True)
-        ws = wb.active
-        min_col = 10
-        max_col = min_col + 10  # Read eleven(!) columns
-        reader = ws.iter_rows(min_col=min_col,
-                max_col=max_col, values_only=True)
         # get names from column headers
         headers = next(reader)
-        allowed_headers = ('Service', 'Achternaam', 'Voornaam', 'Tussenv', 
-                'Actief', 'DienstenPerAantalWeken', 'NietOpDagEnDienst', 
-                'VoorkeurDagEnDienst', 'NietInPeriode', 'VoorkeurTekst', 
-                'NietSamenMet')
         for header in headers:
-            if header not in allowed_headers:
+            if header not in ALLOWED_HEADERS:
                 raise exceptions.SourceFileHeaderError(
                     f'Een of meer kolomkoppen komt niet voor '
-                    f'in {allowed_headers}')
+                    f'in {ALLOWED_HEADERS}')
+        missing_headers = [header for header in REQUIRED_HEADERS
+                           if header not in headers]
+        if missing_headers:
+            raise exceptions.SourceFileHeaderError(
+                f'De kolomkoppen {missing_headers} ontbreken')
         try:
             Data = namedtuple("Data", headers)
         except ValueError as e:
@@ -224,201 +479,162 @@ class Volunteers:
         # start enumerating with line number 2
         for line_num, xls_data in enumerate(map(Data._make, reader), 2):
             # read only the Active persons
-            if (xls_data.Actief):
-
-                # Column Service
-                # TODO Iemand kan zowel verzorger als algemeen zijn!
-                # Moet dus een list worden i.p.v. string, 
-                # met test op 'in' i.p.v. ==
-                service = xls_data.Service or ""
-                service = service.strip()
-                self._check_sanity("service", service, "Service", line_num)
-
-                # Columns Achternaam, Tussenv, Voornaam
-                # Person name
-                insert = xls_data.Tussenv or ""
-                if insert.strip():
-                    insert = " " + insert
-                givenname = xls_data.Voornaam or ""
-                surname = xls_data.Achternaam or "" 
-                name = (givenname.strip() + insert + " " + surname.strip())
-
-                # Column NietOpDagEnDienst
-                not_on_shifts_per_weekday = (
-                    xls_data.NietOpDagEnDienst or "")
-                not_on_shifts_per_weekday = (
-                    self._day_and_shifts_to_dict(not_on_shifts_per_weekday,
-                    'NietOpDagEnDienst', line_num))
-                self._check_sanity('day_and_shifts_dict',
-                        not_on_shifts_per_weekday,
-                        'NietOpDagEnDienst', line_num)
-                
-                # Count the number of not_in_shifts
-                not_on_shifts_count = 0
-                for weekday in not_on_shifts_per_weekday.keys():
-                    not_on_shifts_count += len(
-                        Counter(not_on_shifts_per_weekday[weekday]).values())
-                pass
-                
-                # Column VoorkeurDagEnDienst
-                # preferred_shifts (prefs)
-                prefs_value = xls_data.VoorkeurDagEnDienst or ""
-                pref_day_and_shifts = (
-                    self._day_and_shifts_to_dict(prefs_value,
-                    'VoorkeurDagEnDienst', line_num))
-                self._check_sanity('day_and_shifts_dict',
-                        pref_day_and_shifts,
-                        'VoorkeurDagEnDienst', line_num)
-                
-                # Column DienstenPerAantalWeken
-                # xls OpenOffice is confusing. Even though the column
-                # is formatted as text, the value 1,1 is read as 
-                # a float! After entering the value *again*
-                # it is read as a string.
-                shifts_per_week = xls_data.DienstenPerAantalWeken or ""
-                shifts_per_week = shifts_per_week.replace(" ", "")
-                self._check_sanity("shifts_per_weeks", 
-                        shifts_per_week, "DienstenPerAantalWeken",
-                        line_num)
-                shifts_per_week = (shifts_per_week.split(","))
-                shifts_per_weeks = SimpleNamespace(
-                    shifts=int(shifts_per_week[0]),
-                    per_weeks=int(shifts_per_week[1]))
-
-                # availability_counter (no column)
-                availability_counter = shifts_per_weeks.shifts
-                
-                # weekend counter (no column)
-                # Initially everybody is available for weekends
-                weekend_counter = const.WEEKENDCOUNTER
-
-                # Column NietInPeriode
-                not_in_timespan_value = xls_data.NietInPeriode or ""
-                not_in_timespan = tuple( 
-                    period for period in
-                    not_in_timespan_value.replace(" ", "").split(",") 
-                )
-                self._check_sanity('dates_string', 
-                    not_in_timespan, 'NietInPeriode', line_num)
-                
-                # Now we have all the data to instantiate a Person
-                person = Person()
-                person.name = name
-                person.service = service
-                person.not_on_shifts_per_weekday = (
-                    not_on_shifts_per_weekday)
-                person.not_on_shifts_count = not_on_shifts_count
-                person.shifts_per_weeks = shifts_per_weeks
-                person.not_in_timespan = not_in_timespan
-                person.preferred_shifts = pref_day_and_shifts
-                person.availability_counter = availability_counter
-                person.weekend_counter = weekend_counter
-                volunteers.append(person)
+            if not xls_data.Actief:
+                continue
+            error_count = len(errors)
+
+            # Column Service
+            # TODO Iemand kan zowel verzorger als algemeen zijn!
+            # Moet dus een list worden i.p.v. string, 
+            # met test op 'in' i.p.v. ==
+            service = self._check_sanity(self._parse_service, 
+                xls_data.Service, 'Service', line_num, errors)
+
+            # Columns Achternaam, Tussenv, Voornaam
+            # Person name
+            insert = xls_data.Tussenv or ""
+            if insert.strip():
+                insert = " " + insert
+            givenname = xls_data.Voornaam or ""
+            surname = xls_data.Achternaam or "" 
+            name = (givenname.strip() + insert + " " + surname.strip())
+            if name in names:
+                errors.append(exceptions.DuplicatePersonnameError(
+                    f'Dubbele naam: {name!r}, regel: {line_num}'))
+            names.add(name)
+
+            # Column NietOpDagEnDienst
+            not_on_shifts_per_weekday = self._check_sanity(
+                self._parse_day_and_shifts, xls_data.NietOpDagEnDienst,
+                'NietOpDagEnDienst', line_num, errors)
+
+            # Column VoorkeurDagEnDienst
+            # preferred_shifts (prefs)
+            pref_day_and_shifts = self._check_sanity(
+                self._parse_day_and_shifts, xls_data.VoorkeurDagEnDienst,
+                'VoorkeurDagEnDienst', line_num, errors)
+
+            # Column DienstenPerAantalWeken
+            shifts_per_weeks = self._check_sanity(
+                self._parse_shifts_per_weeks, 
+                xls_data.DienstenPerAantalWeken,
+                'DienstenPerAantalWeken', line_num, errors)
+
+            # Column NietInPeriode
+            not_in_timespan = self._check_sanity(
+                self._parse_timespans, xls_data.NietInPeriode,
+                'NietInPeriode', line_num, errors)
+
+            if len(errors) > error_count:
+                # Check the other rows, but don't make a Person
+                continue
+
+            # Now we have all the data to instantiate a Person
+            person = Person()
+            person.name = name
+            person.service = service
+            person.not_on_shifts_per_weekday = not_on_shifts_per_weekday
+            # Count the number of not_in_shifts
+            person.not_on_shifts_count = sum(
+                len(shifts) for shifts in not_on_shifts_per_weekday.values())
+            person.shifts_per_weeks = shifts_per_weeks
+            person.not_in_timespan = not_in_timespan
+            person.preferred_shifts = pref_day_and_shifts
+            # availability_counter (no column)
+            person.availability_counter = shifts_per_weeks.shifts
+            # weekend counter (no column)
+            # Initially everybody is available for weekends
+            person.weekend_counter = const.WEEKENDCOUNTER
+            volunteers.append(person)
+
+        self._raise_errors(errors)
         return tuple(volunteers)
 
-    def _check_sanity(self, test, operand=None, 
-                      columnname=None, line_num=None):
+    def _check_sanity(self, parse, value, columnname, line_num, errors):
         """Check the validity of the input data from the sourcefile.
+        Return parse(<value>, <columnname>, <line_num>),
+        or None if the value is not valid. The error is added
+        to <errors>, so that the next values are checked too.
         """
-        # ------------------------------------------------------------
-        # Start of helper functions
-        def find_duplicate_personnames(nameslist, name):
-            return [idx for idx, value in enumerate(nameslist)
-                    if value == name]
-        
-        def check_day_and_shifts_count(operand):
-            """Check for duplicate shifts in a day_and_shifts dict.
-            """
-            for weekday in operand.keys():
-                cnt = Counter(operand[weekday])
-                for shift in cnt.values():
-                    if shift > 1:
-                        return False
-            return True
-        
-        def check_day_and_shifts_string(operand):
-            # Return None if something is wrong.
-            # return anything else if things are o.k.
+        try:
+            return parse(value, columnname, line_num)
+        except exceptions.SourcefileValueError as e:
+            errors.append(e)
+            return None
 
-            # There are no spaces in the operand.
-            # operand example: di:1,2,3#wo:1,2,3#do:1,2,3#vr:1,2,3#
-            
-            # Check if the operand ends with a '#'.
-            if operand[-1] != "#":
-                return None
-
-            # The pattern is
-            # weekday + ':'
-            #   + comma seperated shiftnumber e.g (1,2,3,4) or (1,2) or (3)
-            # and then an endless repetition of
-            #   '#' + (the first part, ending with '#').
-            # Example: ma:1,2,3,4# di:1,2,3# zo:4#
-            pattern = r'^(((ma|di|wo|do|vr|za|zo)[:][1-4]([,][1-4])*)[#])*$'
-            return re.match(pattern, operand)
-
-        def check_shifts_per_weeks(operand):
-            # shifts_per_weeks must be like 1,2 or 3,2 or ...
-            pattern = r'^(1,1|1,2|3,2|2,1|2,3)$'
-            return re.match(pattern, operand)
-
-        # End of helper functions
-        # ------------------------------------------------------------
-        match test:
-            case 'duplicate_names': 
-                nameslist = [p.name for p in self.persons]
-                for name in nameslist:
-                    if len(find_duplicate_personnames(nameslist, name)) > 1:
-                        raise exceptions.DuplicatePersonnameError(name)
-            
-            case 'day_and_shifts_string':
-                if not check_day_and_shifts_string(operand):
-                    raise exceptions.DayAndShiftsStringError(
-                        columnname, line_num, operand)
-            
-            case 'day_and_shifts_dict':
-                if not check_day_and_shifts_count(operand):
-                    raise exceptions.DayAndShiftsStringError(
-                        columnname, line_num, operand)
-            
-            case 'shifts_per_weeks':
-                if not check_shifts_per_weeks(operand):
-                    raise exceptions.ShiftsPerWeeksError(
-                        columnname, line_num, operand)
-            
-            case 'service':
-                if not (operand in ('verzorger', 'algemeen')):
-                    raise exceptions.ServicenameError(
-                        columnname, line_num, operand)
-
-            case 'dates_string':
-                if all(operand):
-                    # TODO gekopieerd uit init_agenda!
-                    # TODO het jaar kan ook onjuist zijn, maar denk eraan
-                    # dat de kwartalen over het jaar heen gaan.
-                    for item in operand:
-                        dates = item.split('>') 
-                        try:
-                            if len(dates) > 1:
-                                startdate = datetime.strptime(dates[0], 
-                                            const.DATEFORMAT).date()
-                                enddate = datetime.strptime(dates[1], 
-                                          const.DATEFORMAT).date()
-                                if enddate < startdate:
-                                    raise exceptions.DateTimespanError(
-                                        columnname, line_num, item)
-                            else:
-                                # The variable is not important,
-                                # only the execution of the function.
-                                _ = datetime.strptime(dates[0], 
-                                    const.DATEFORMAT).date()
-                        except ValueError:
-                            line_num = str(line_num)
-                            raise exceptions.DateFormatError(
-                                columnname, line_num, item)
-            
-            case _:
-                raise exceptions.MissingCaseValueError(
-                    'No match found for "test" in _check_sanity()')
+    def _raise_errors(self, errors):
+        """Raise the error in <errors> if there is one, 
+        raise SourcefileErrors if there is more than one.
+        """
+        if len(errors) == 1:
+            raise errors[0]
+        if errors:
+            raise exceptions.SourcefileErrors(errors)
+
+    def _parse_service(self, value, columnname, line_num):
+        """Return the service in <value>, 'verzorger' or 'algemeen'.
+        """
+        service = (value or "").strip()
+        if service not in SERVICES:
+            raise exceptions.ServicenameError(columnname, line_num, value)
+        return service
+
+    def _parse_day_and_shifts(self, value, columnname, line_num):
+        """<value> is 
+        for example 'ma:1, 2,3,4#  wo:3,4 # zo:4#'
+        The function returns the dict: { 1: (1,2,3,4), 3: (3,4), 7: (4) }
+        The weekddays are translated to isoweekday numbers,
+        and the shifts are in a tuple.
+        A shift can be in a weekday only once.
+        """
+        spaceless_string = (value or "").replace(" ", "")
+        try:
+            return parse_day_and_shifts(spaceless_string)
+        except ValueError:
+            raise exceptions.DayAndShiftsStringError(
+                columnname, line_num, spaceless_string) from None
+
+    def _parse_shifts_per_weeks(self, value, columnname, line_num):
+        """Return the shifts_per_weeks in <value>, e.g. '1,2',
+        as ShiftsPerWeeks(shifts=1, per_weeks=2).
+        """
+        # xls OpenOffice is confusing. Even though the column
+        # is formatted as text, the value 1,1 is read as 
+        # a float! After entering the value *again*
+        # it is read as a string.
+        spaceless_string = (value or "").replace(" ", "")
+        if not SHIFTS_PER_WEEKS_PATTERN.match(spaceless_string):
+            raise exceptions.ShiftsPerWeeksError(
+                columnname, line_num, spaceless_string)
+        shifts, per_weeks = spaceless_string.split(",")
+        return shifts_per_weeks(int(shifts), int(per_weeks))
+
+    def _parse_timespans(self, value, columnname, line_num):
+        """<value> is a comma seperated list of dates and timespans,
+        e.g. '1-4-2023, 10-4-2023>14-4-2023'.
+        Return a tuple of (startdate, enddate) date_objects,
+        sorted and merged by merge_timespans().
+        """
+        # TODO het jaar kan ook onjuist zijn, maar denk eraan
+        # dat de kwartalen over het jaar heen gaan.
+        timespans = []
+        for item in (value or "").replace(" ", "").split(","):
+            if not item:
+                continue
+            dates = item.split('>')
+            try:
+                if len(dates) > 2:
+                    raise ValueError
+                startdate = parse_date(dates[0])
+                enddate = parse_date(dates[-1])
+            except ValueError:
+                raise exceptions.DateFormatError(
+                    columnname, str(line_num), item) from None
+            if enddate < startdate:
+                raise exceptions.DateTimespanError(
+                    columnname, line_num, item)
+            timespans.append((startdate, enddate))
+        return merge_timespans(timespans)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,243 @@
+"""Improve a schedule after Scheduler.schedule_volunteers()
+with a local search. The search fills empty shifts, moves volunteers
+to an empty shift and swaps volunteers between shifts,
+without breaking the rules of the schedule.
+
+The rules are those of rules.py, the same as the solver,
+except that the shifts that are already scheduled are not checked.
+Each move is evaluated in constant time with rules.RuleCheck.
+"""
+import math
+import time
+
+import rules
+
+# Weights in the objective: a scheduled shift comes first,
+# then a volunteer that is used at least once, then a preferred shift.
+SHIFT_WEIGHT = 1000
+USED_WEIGHT = 10
+PREFERENCE_WEIGHT = 1
+
+SLOT_OF_SERVICE = {'verzorger': 0, 'algemeen': 1}
+
+
+class Repair:
+    """Local search on the agenda of a Scheduler.
+
+    Attributes:
+        scheduler: (Scheduler)
+            The scheduler with a scheduled agenda.
+        rules: (rules.RuleCheck)
+            The rules, with the shifts of the persons in the agenda.
+        objective: (int)
+            The value of the schedule, higher is better.
+            See SHIFT_WEIGHT, USED_WEIGHT and PREFERENCE_WEIGHT.
+        empty_slots: (list)
+            (index of agenda item, slot) of the shifts without a volunteer.
+            Slot 0 is the caretaker and slot 1 is the generalist.
+        filled_slots: (list)
+            (index of agenda item, slot) of the shifts with a volunteer.
+    """
+    def __init__(self, scheduler, rng=None):
+        self.scheduler = scheduler
+        # Use the random generator of the scheduler,
+        # so that a seeded schedule is repaired the same way.
+        self.rng = rng if rng is not None else scheduler.random
+        self.items = scheduler.agenda.items
+        self.persons = scheduler.Volunteers.persons_by_name
+        self.holydays = set(scheduler.holydays)
+
+        self.rules = rules.RuleCheck(
+            scheduler.agenda, scheduler.Volunteers, scheduler.holydays,
+            scheduler.carried_over_dates, scheduler.carried_over_counters)
+        self.can_take = self.rules.can_take
+
+        # Per slot the names of the persons with the service of the slot
+        self.candidates = [()] * len(SLOT_OF_SERVICE)
+        by_service = scheduler.Volunteers.persons_by_service
+        for service, slot in SLOT_OF_SERVICE.items():
+            self.candidates[slot] = tuple(by_service[service])
+
+        self.shift_count = {name: 0 for name in self.persons}
+        self.used_count = 0
+        self.objective = 0
+
+        self.empty_slots = []
+        self.filled_slots = []
+        self._slot_position = {}
+        for index, ag_item in enumerate(self.items):
+            if ag_item.date in self.holydays:
+                continue
+            for slot, name in enumerate(ag_item.persons):
+                if name:
+                    self._add(name, index)
+                    self._push(self.filled_slots, (index, slot))
+                else:
+                    self._push(self.empty_slots, (index, slot))
+
+    def _push(self, slots, slot):
+        self._slot_position[slot] = len(slots)
+        slots.append(slot)
+
+    def _pop(self, slots, slot):
+        """Remove <slot> from <slots> in constant time
+        by moving the last slot to its position.
+        """
+        position = self._slot_position.pop(slot)
+        last = slots.pop()
+        if last != slot:
+            slots[position] = last
+            self._slot_position[last] = position
+
+    def _value(self, name, index):
+        """Return the value of <name> in agenda item <index>,
+        without the USED_WEIGHT.
+        """
+        ag_item = self.items[index]
+        preferred = self.persons[name].preferred_shifts.get(
+            ag_item.weekday, ())
+        return SHIFT_WEIGHT + PREFERENCE_WEIGHT * (ag_item.shift in preferred)
+
+    def _add(self, name, index):
+        """Count <name> in agenda item <index> and update the objective.
+        """
+        self.rules.add(name, index)
+        self.objective += self._value(name, index)
+        self.shift_count[name] += 1
+        if self.shift_count[name] == 1:
+            self.used_count += 1
+            self.objective += USED_WEIGHT
+
+    def _remove(self, name, index):
+        """Uncount <name> in agenda item <index> and update the objective.
+        """
+        self.rules.remove(name, index)
+        self.objective -= self._value(name, index)
+        self.shift_count[name] -= 1
+        if self.shift_count[name] == 0:
+            self.used_count -= 1
+            self.objective -= USED_WEIGHT
+
+    def _used_delta(self, name, step):
+        """Return the change of the USED_WEIGHT part of the objective
+        if <step> (1 or -1) shifts are added for <name>.
+        """
+        count = self.shift_count[name]
+        if step == 1 and count == 0:
+            return USED_WEIGHT
+        if step == -1 and count == 1:
+            return -USED_WEIGHT
+        return 0
+
+    def _try_fill(self, index, slot):
+        """Try to schedule a random person in the empty slot.
+        Return the change of the objective, or None.
+        """
+        name = self.rng.choice(self.candidates[slot])
+        if self.can_take(name, index):
+            return lambda: self._fill(name, index, slot), (
+                self._value(name, index) + self._used_delta(name, 1))
+        return None
+
+    def _fill(self, name, index, slot):
+        self.items[index].persons[slot] = name
+        self._add(name, index)
+        self._pop(self.empty_slots, (index, slot))
+        self._push(self.filled_slots, (index, slot))
+
+    def _try_move(self, index, slot):
+        """Try to move a random scheduled person to the empty slot.
+        Return the change of the objective, or None.
+        """
+        from_index, from_slot = self.rng.choice(self.filled_slots)
+        if from_slot != slot:
+            return None
+        name = self.items[from_index].persons[from_slot]
+        if not self.can_take(name, index, vacated=from_index):
+            return None
+        delta = self._value(name, index) - self._value(name, from_index)
+        return lambda: self._move(name, from_index, index, slot), delta
+
+    def _move(self, name, from_index, index, slot):
+        self.items[from_index].persons[slot] = ""
+        self._remove(name, from_index)
+        self._pop(self.filled_slots, (from_index, slot))
+        self._push(self.empty_slots, (from_index, slot))
+        self._fill(name, index, slot)
+
+    def _try_swap(self):
+        """Try to swap two random scheduled persons of the same service.
+        Return the change of the objective, or None.
+        """
+        index_a, slot = self.rng.choice(self.filled_slots)
+        index_b, slot_b = self.rng.choice(self.filled_slots)
+        if slot != slot_b or index_a == index_b:
+            return None
+        name_a = self.items[index_a].persons[slot]
+        name_b = self.items[index_b].persons[slot]
+        if not (self.can_take(name_a, index_b, vacated=index_a)
+                and self.can_take(name_b, index_a, vacated=index_b)):
+            return None
+        delta = (self._value(name_a, index_b) + self._value(name_b, index_a)
+                 - self._value(name_a, index_a)
+                 - self._value(name_b, index_b))
+        return lambda: self._swap(name_a, name_b, index_a, index_b,
+                                  slot), delta
+
+    def _swap(self, name_a, name_b, index_a, index_b, slot):
+        self._remove(name_a, index_a)
+        self._remove(name_b, index_b)
+        self.items[index_a].persons[slot] = name_b
+        self.items[index_b].persons[slot] = name_a
+        self._add(name_a, index_b)
+        self._add(name_b, index_a)
+
+    def run(self, max_seconds=None, max_iterations=None, temperature=2.0):
+        """Search until <max_seconds> or <max_iterations> have passed
+        (1 second if neither is given).
+        A move that makes the objective worse is accepted with
+        a probability that gets smaller as the search proceeds
+        (simulated annealing). With <max_iterations> the temperature
+        follows the iterations, not the time, so the same random
+        generator gives the same search. Then <max_seconds> only 
+        stops a search that takes too long.
+        Return the number of iterations.
+        """
+        if max_seconds is None and max_iterations is None:
+            max_seconds = 1.0
+        start = time.perf_counter()
+        iteration = 0
+        while True:
+            elapsed = time.perf_counter() - start
+            if max_seconds is not None and elapsed >= max_seconds:
+                break
+            if max_iterations is not None and iteration >= max_iterations:
+                break
+            if not self.empty_slots:
+                break
+            iteration += 1
+            if max_iterations:
+                progress = iteration / max_iterations
+            else:
+                progress = elapsed / max_seconds
+            current_temperature = temperature * (1 - progress) + 1e-9
+
+            choice = self.rng.random()
+            if choice < 0.5:
+                index, slot = self.rng.choice(self.empty_slots)
+                move = self._try_fill(index, slot)
+            elif choice < 0.8 and self.filled_slots:
+                index, slot = self.rng.choice(self.empty_slots)
+                move = self._try_move(index, slot)
+            elif self.filled_slots:
+                move = self._try_swap()
+            else:
+                move = None
+            if move is None:
+                continue
+            apply, delta = move
+            if (delta >= 0 or self.rng.random()
+                    < math.exp(delta / current_temperature)):
+                apply()
+        self.scheduler._count_week_shifts()
+        return iteration
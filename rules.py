@@ -0,0 +1,286 @@
+"""The rules of a schedule, in one place for the check of a shift
+in a scheduled agenda (Scheduler.can_take(), repair.Repair)
+and for the constraint model (solver.py):
+- the static rules (not_on_shifts_per_weekday, not_in_timespan),
+    and the dates of the quarter before (Scheduler.carried_over_dates)
+- no volunteers on a holyday
+- not more than one shift per day and not two days in a row
+- shifts_per_weeks, for the shifts from monday to friday:
+    not more than <shifts> in <per_weeks> consecutive weeks
+    and not more than <shifts> / <per_weeks> (rounded up) in a week.
+    Once per two weeks counts per pair of weeks that starts
+    in an even week, like the availability_counter of the Scheduler.
+- not more than two shifts in a week
+- not more than one weekend per WEEKENDCOUNTER weeks, except for
+    the PERSONS_ALWAYS_IN_WEEKEND
+- after the quarter before (Scheduler.carried_over_counters):
+    not more shifts from monday to friday in the first week than
+    the availability_counter, and no weekend before the weekend_counter
+    reaches WEEKENDCOUNTER
+The Scheduler applies the same rules with its counters
+while it schedules (see Scheduler._determine_group_not_available()).
+"""
+import const
+
+MAX_SHIFTS_IN_WEEK = 2
+
+# shifts_per_weeks that counts per pair of weeks, not in any
+# two consecutive weeks (see Scheduler._reset_availability_counter())
+ONCE_PER_PAIR_OF_WEEKS = (1, 2)
+
+
+def is_weekend(ag_item):
+    return ag_item.weekday in (6, 7)
+
+
+def weekday_limit_in_week(shifts_per_weeks):
+    """Return the most shifts from monday to friday in a week.
+    """
+    return -(-shifts_per_weeks.shifts // shifts_per_weeks.per_weeks)
+
+
+def week_blocks(weeknrs, shifts_per_weeks):
+    """Return the positions in <weeknrs> in disjoint blocks of
+    <per_weeks> weeks, in which the shifts from monday to friday
+    count for shifts_per_weeks. A pair of weeks starts in an even week
+    for ONCE_PER_PAIR_OF_WEEKS.
+    """
+    blocks = []
+    for position, weeknr in enumerate(weeknrs):
+        if tuple(shifts_per_weeks) == ONCE_PER_PAIR_OF_WEEKS:
+            new_block = not blocks or weeknr % 2 == 0
+        else:
+            new_block = position % shifts_per_weeks.per_weeks == 0
+        if new_block:
+            blocks.append([])
+        blocks[-1].append(position)
+    return [tuple(block) for block in blocks]
+
+
+def _sliding_windows(week_count, size):
+    """Return the windows of <size> consecutive week positions.
+    """
+    size = min(size, week_count)
+    return [tuple(range(start, start + size))
+            for start in range(week_count - size + 1)]
+
+
+def weekday_windows(weeknrs, shifts_per_weeks):
+    """Return the windows of week positions in which a person
+    has at most shifts_per_weeks.shifts shifts from monday to friday.
+    """
+    if tuple(shifts_per_weeks) == ONCE_PER_PAIR_OF_WEEKS:
+        return week_blocks(weeknrs, shifts_per_weeks)
+    return _sliding_windows(len(weeknrs), shifts_per_weeks.per_weeks)
+
+
+def weekend_windows(weeknrs, name):
+    """Return the windows of week positions in which person <name>
+    has at most one shift in the weekend.
+    """
+    if name in const.PERSONS_ALWAYS_IN_WEEKEND:
+        return []
+    return _sliding_windows(len(weeknrs), const.WEEKENDCOUNTER)
+
+
+class RuleCheck:
+    """Check in constant time if a person can take a shift
+    in a scheduled agenda. The counters of the persons per day
+    and per week are kept up to date with add() and remove(),
+    so only the days and weeks around a shift are checked.
+
+    Attributes:
+        agenda: (Agenda)
+        persons: (dict)
+            key=(string) name, value = (Person).
+        week_of: (list)
+            The week position of each agenda item.
+        day_of: (list)
+            The ordinal of the date of each agenda item.
+        weekend: (list)
+            True for each agenda item in a weekend.
+        not_available: (set)
+            (name, index of agenda item) on which a person is not
+            willing to work, has a day off, is not available
+            because of the quarter before, or that is on a holyday.
+        first_week_limits: (dict)
+            key=name, value = (int) the most shifts from monday
+            to friday in the first week, after the quarter before.
+        on_day, in_week, weekdays_in_week, weekends_in_week: (dict)
+            key=(name, day or week position), value = (int) shifts.
+    """
+    def __init__(self, agenda, volunteers, holydays,
+                 carried_over_dates=None, carried_over_counters=None):
+        self.agenda = agenda
+        self.persons = volunteers.persons_by_name
+        self.week_of = [agenda.week_positions[ag_item.weeknr]
+                        for ag_item in agenda.items]
+        self.day_of = [ag_item.date.toordinal() for ag_item in agenda.items]
+        self.weekend = [is_weekend(ag_item) for ag_item in agenda.items]
+        self._register_static_rules(holydays, carried_over_dates or {})
+        self.first_week_limits = {}
+        self._register_carried_over_counters(carried_over_counters or {})
+
+        # Per week position the windows that contain it,
+        # the same for the persons with the same shifts_per_weeks.
+        weeknrs = list(agenda.week_positions)
+        self._weekday_windows = {}
+        self._weekend_windows = {}
+        for person in self.persons.values():
+            key = tuple(person.shifts_per_weeks)
+            if key not in self._weekday_windows:
+                self._weekday_windows[key] = self._windows_per_week(
+                    weekday_windows(weeknrs, person.shifts_per_weeks),
+                    len(weeknrs))
+            self._weekend_windows[person.name] = self._windows_per_week(
+                weekend_windows(weeknrs, person.name), len(weeknrs))
+
+        self.on_day = {}
+        self.in_week = {}
+        self.weekdays_in_week = {}
+        self.weekends_in_week = {}
+
+    @staticmethod
+    def _windows_per_week(windows, week_count):
+        per_week = [[] for _ in range(week_count)]
+        for window in windows:
+            for position in window:
+                per_week[position].append(window)
+        return per_week
+
+    def _register_static_rules(self, holydays, carried_over_dates):
+        agenda = self.agenda
+        self.not_available = set()
+        holydays = set(holydays)
+        for index, ag_item in enumerate(agenda.items):
+            if ag_item.date in holydays:
+                self.not_available.update(
+                    (name, index) for name in self.persons)
+        for person in self.persons.values():
+            for weekday, shifts in person.not_on_shifts_per_weekday.items():
+                for shift in shifts:
+                    for ag_item in agenda.items_on_weekday_and_shift(
+                            weekday, shift):
+                        self.not_available.add(
+                            (person.name, agenda.index_of(ag_item)))
+            for timespan in person.not_in_timespan:
+                for ag_item in agenda.items_in_timespan(*timespan):
+                    self.not_available.add(
+                        (person.name, agenda.index_of(ag_item)))
+        for name, dates in carried_over_dates.items():
+            for date in dates:
+                for ag_item in agenda.items_on_date(date):
+                    self.not_available.add((name, agenda.index_of(ag_item)))
+
+    def _register_carried_over_counters(self, carried_over_counters):
+        for name, (availability_counter, weekend_counter) in (
+                carried_over_counters.items()):
+            self.first_week_limits[name] = availability_counter
+            if name in const.PERSONS_ALWAYS_IN_WEEKEND:
+                continue
+            # The weekend_counter grows by one each week
+            first_weekend = const.WEEKENDCOUNTER - weekend_counter
+            for index, week in enumerate(self.week_of):
+                if self.weekend[index] and week < first_weekend:
+                    self.not_available.add((name, index))
+
+    def weekday_limit(self, name, week):
+        """Return the most shifts from monday to friday of person
+        <name> in the week at position <week>.
+        """
+        limit = weekday_limit_in_week(self.persons[name].shifts_per_weeks)
+        if week == 0:
+            limit = min(limit, self.first_week_limits.get(name, limit))
+        return limit
+
+    def available(self, name, index):
+        """Return True if the static rules allow person <name>
+        in agenda item <index>.
+        """
+        return (name, index) not in self.not_available
+
+    def add_scheduled(self):
+        """Count the persons that are scheduled in the agenda.
+        """
+        for index, ag_item in enumerate(self.agenda.items):
+            for name in ag_item.persons:
+                if name:
+                    self.add(name, index)
+
+    def add(self, name, index):
+        self._count(name, index, 1)
+
+    def remove(self, name, index):
+        self._count(name, index, -1)
+
+    def _count(self, name, index, step):
+        day_key = (name, self.day_of[index])
+        week_key = (name, self.week_of[index])
+        self.on_day[day_key] = self.on_day.get(day_key, 0) + step
+        self.in_week[week_key] = self.in_week.get(week_key, 0) + step
+        if self.weekend[index]:
+            counter = self.weekends_in_week
+        else:
+            counter = self.weekdays_in_week
+        counter[week_key] = counter.get(week_key, 0) + step
+
+    def can_take(self, name, index, vacated=None):
+        """Return True if person <name> can be scheduled
+        in agenda item <index> without breaking a rule,
+        when the person leaves agenda item <vacated> (if not None).
+        """
+        if (name, index) in self.not_available:
+            return False
+        person = self.persons[name]
+
+        def count(counter, key, vacated_key=None):
+            # The count without the vacated agenda item.
+            # key[1] is a day or a week position, like vacated_key.
+            value = counter.get(key, 0)
+            if vacated is not None and key[1] == vacated_key:
+                value -= 1
+            return value
+
+        vacated_day = self.day_of[vacated] if vacated is not None else None
+        vacated_week = self.week_of[vacated] if vacated is not None else None
+        vacated_weekend = (self.weekend[vacated]
+                           if vacated is not None else None)
+
+        # Not more than one shift per day and not two days in a row
+        day = self.day_of[index]
+        for d in (day - 1, day, day + 1):
+            if count(self.on_day, (name, d), vacated_day) > 0:
+                return False
+
+        # Not more than two shifts in a week
+        week = self.week_of[index]
+        if count(self.in_week, (name, week),
+                 vacated_week) >= MAX_SHIFTS_IN_WEEK:
+            return False
+
+        if self.weekend[index]:
+            # One weekend per WEEKENDCOUNTER weeks
+            windows = self._weekend_windows[name][week]
+            limit = 1
+            counter = self.weekends_in_week
+            same_kind = vacated_weekend is True
+        else:
+            # shifts_per_weeks, from monday to friday
+            if count(self.weekdays_in_week, (name, week),
+                     vacated_week if vacated_weekend is False else None
+                     ) >= self.weekday_limit(name, week):
+                return False
+            windows = self._weekday_windows[
+                tuple(person.shifts_per_weeks)][week]
+            limit = person.shifts_per_weeks.shifts
+            counter = self.weekdays_in_week
+            same_kind = vacated_weekend is False
+
+        for window in windows:
+            total = sum(
+                count(counter, (name, w),
+                      vacated_week if same_kind else None)
+                for w in window)
+            if total >= limit:
+                return False
+        return True
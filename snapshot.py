@@ -0,0 +1,207 @@
+"""Save a scheduled agenda, together with the volunteers and their
+counters, in a compact json file, and load it again.
+A later run can report on a schedule, continue with it
+(e.g. Scheduler.reschedule_unavailable() or Scheduler.quarter_state())
+or compare versions, without reading the sourcefile
+and without scheduling again.
+
+The file has plain columns (lists of names, numbers and dates as
+ISO text), not the classes of the planner, so a snapshot can still be
+read after the classes have changed. It is json and not a pickle,
+because loading a pickle from someone else can run any code.
+Each list has one value per person or one value per agenda item,
+and a scheduled person is stored as the position of the name in
+'names' (-1 for a shift without a volunteer).
+"""
+from collections import namedtuple
+from datetime import date as Date
+import json
+
+import exceptions
+import init_volunteers
+
+# Changed when the columns change
+SNAPSHOT_FORMAT = 3
+
+# A scheduled agenda.
+#   year, quarter, version: (int) see Scheduler
+#   sourcefilename: (string) the sourcefile of the volunteers
+#   persons: tuple of init_volunteers.Person, with their counters
+#   caretakers, generalists: tuple of (string) person name
+#       per agenda item, "" for a shift without a volunteer
+#   not_available_next_quarter: (set) see Scheduler
+#   carried_over_dates, carried_over_counters: (dict) see Scheduler
+#   random_state: the state of Scheduler.random
+Snapshot = namedtuple('Snapshot', (
+    'year', 'quarter', 'version', 'sourcefilename', 'persons',
+    'caretakers', 'generalists', 'not_available_next_quarter',
+    'carried_over_dates', 'carried_over_counters', 'random_state'))
+
+
+def from_scheduler(scheduler):
+    """Return the Snapshot of the agenda of <scheduler>.
+    Only a scheduled agenda can be saved: the state of a partly 
+    scheduled agenda (see Scheduler.schedule_volunteers()) 
+    is more than the columns of a snapshot.
+    """
+    if scheduler.scheduled_items < len(scheduler.agenda.items):
+        raise exceptions.SnapshotError(
+            f'De planning is nog niet af en kan niet worden opgeslagen: '
+            f'{scheduler.scheduled_items} van '
+            f'{len(scheduler.agenda.items)} diensten zijn gepland')
+    return Snapshot(
+        year=scheduler.year,
+        quarter=scheduler.quarter,
+        version=scheduler.version,
+        sourcefilename=str(scheduler.Volunteers.sourcefilename),
+        persons=scheduler.all_persons,
+        caretakers=tuple(i.persons[0] for i in scheduler.agenda.items),
+        generalists=tuple(i.persons[1] for i in scheduler.agenda.items),
+        not_available_next_quarter=set(
+            scheduler.not_available_next_quarter),
+        carried_over_dates=scheduler.carried_over_dates,
+        carried_over_counters=scheduler.carried_over_counters,
+        random_state=scheduler.random.getstate())
+
+
+def _day_and_shifts_to_list(day_and_shifts):
+    """Return the dict <day_and_shifts> as a list of [weekday, shifts],
+    json has no int keys.
+    """
+    return [[weekday, list(shifts)]
+            for weekday, shifts in day_and_shifts.items()]
+
+
+def save(snapshot, filename):
+    """Write <snapshot> to the json file <filename>.
+    """
+    persons = snapshot.persons
+    names = [p.name for p in persons]
+    position = {name: index for index, name in enumerate(names)}
+    version, internal_state, gauss_next = snapshot.random_state
+    data = {
+        'format': SNAPSHOT_FORMAT,
+        'year': snapshot.year,
+        'quarter': snapshot.quarter,
+        'version': snapshot.version,
+        'sourcefilename': snapshot.sourcefilename,
+        'random_state': [version, list(internal_state), gauss_next],
+        # One value per person
+        'names': names,
+        'services': [p.service for p in persons],
+        'shifts_per_weeks': [[p.shifts_per_weeks.shifts,
+                              p.shifts_per_weeks.per_weeks]
+                             for p in persons],
+        'not_on_shifts_per_weekday': [
+            _day_and_shifts_to_list(p.not_on_shifts_per_weekday)
+            for p in persons],
+        'preferred_shifts': [_day_and_shifts_to_list(p.preferred_shifts)
+                             for p in persons],
+        'not_in_timespan': [[[startdate.isoformat(), enddate.isoformat()]
+                             for startdate, enddate in p.not_in_timespan]
+                            for p in persons],
+        'availability_counters': [p.availability_counter for p in persons],
+        'weekend_counters': [p.weekend_counter for p in persons],
+        'carried_over_dates': [
+            sorted(date.isoformat() for date 
+                   in snapshot.carried_over_dates.get(p.name, ()))
+            for p in persons],
+        'carried_over_counters': [
+            list(snapshot.carried_over_counters[p.name])
+            if p.name in snapshot.carried_over_counters else None
+            for p in persons],
+        'not_available_next_quarter': [
+            position[name] for name in snapshot.not_available_next_quarter],
+        # One value per agenda item
+        'caretakers': [position.get(name, -1)
+                       for name in snapshot.caretakers],
+        'generalists': [position.get(name, -1)
+                        for name in snapshot.generalists],
+    }
+    with open(filename, 'w', encoding='UTF-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    print(f'Bestand opgeslagen: {filename}')
+
+
+def load(filename):
+    """Return the Snapshot in the json file <filename>.
+    """
+    try:
+        with open(filename, encoding='UTF-8') as f:
+            data = json.load(f)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise exceptions.SnapshotError(
+            f'Het bestand {filename!r} is geen opgeslagen planning') from e
+    if not isinstance(data, dict) or data.get('format') != SNAPSHOT_FORMAT:
+        raise exceptions.SnapshotError(
+            f'Het bestand {filename!r} is geen opgeslagen planning '
+            f'met formaat {SNAPSHOT_FORMAT}')
+    try:
+        return _from_data(data)
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        raise exceptions.SnapshotError(
+            f'Het bestand {filename!r} is een beschadigde '
+            f'opgeslagen planning') from e
+
+
+def _from_data(data):
+    """Return the Snapshot of the columns in <data>.
+    """
+    # Persons with the same preferences share the dict,
+    # like the persons read from the sourcefile.
+    shared = {}
+
+    def day_and_shifts(pairs):
+        key = tuple((weekday, tuple(shifts)) for weekday, shifts in pairs)
+        return shared.setdefault(key, dict(key))
+
+    persons = []
+    carried_over_dates = {}
+    carried_over_counters = {}
+    for index, name in enumerate(data['names']):
+        person = init_volunteers.Person()
+        person.name = name
+        person.service = data['services'][index]
+        shifts, per_weeks = data['shifts_per_weeks'][index]
+        person.shifts_per_weeks = init_volunteers.shifts_per_weeks(
+            shifts, per_weeks)
+        person.not_on_shifts_per_weekday = day_and_shifts(
+            data['not_on_shifts_per_weekday'][index])
+        person.not_on_shifts_count = sum(
+            len(shifts)
+            for shifts in person.not_on_shifts_per_weekday.values())
+        person.preferred_shifts = day_and_shifts(
+            data['preferred_shifts'][index])
+        person.not_in_timespan = tuple(
+            (Date.fromisoformat(startdate), Date.fromisoformat(enddate))
+            for startdate, enddate in data['not_in_timespan'][index])
+        person.availability_counter = data['availability_counters'][index]
+        person.weekend_counter = data['weekend_counters'][index]
+        persons.append(person)
+        if data['carried_over_dates'][index]:
+            carried_over_dates[name] = {
+                Date.fromisoformat(text)
+                for text in data['carried_over_dates'][index]}
+        if data['carried_over_counters'][index] is not None:
+            availability_counter, weekend_counter = (
+                data['carried_over_counters'][index])
+            carried_over_counters[name] = (availability_counter,
+                                           weekend_counter)
+
+    names = data['names']
+    version, internal_state, gauss_next = data['random_state']
+    return Snapshot(
+        year=data['year'],
+        quarter=data['quarter'],
+        version=data['version'],
+        sourcefilename=data['sourcefilename'],
+        persons=tuple(persons),
+        caretakers=tuple(names[i] if i >= 0 else ""
+                         for i in data['caretakers']),
+        generalists=tuple(names[i] if i >= 0 else ""
+                          for i in data['generalists']),
+        not_available_next_quarter={
+            names[i] for i in data['not_available_next_quarter']},
+        carried_over_dates=carried_over_dates,
+        carried_over_counters=carried_over_counters,
+        random_state=(version, tuple(internal_state), gauss_next))
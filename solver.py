@@ -0,0 +1,162 @@
+"""Schedule the volunteers with a constraint model instead of
+the greedy Scheduler. The model is solved with the CP-SAT solver
+of OR-Tools (pip install ortools), which runs locally.
+
+The rules of the model are those of rules.py, with in addition
+one caretaker and one generalist per shift.
+The solver maximises the number of scheduled shifts,
+and then the number of shifts on a preferred weekday and shift.
+"""
+from datetime import timedelta
+
+try:
+    from ortools.sat.python import cp_model
+except ImportError:
+    cp_model = None
+
+import exceptions
+import rules
+
+# Weight of a scheduled shift in the objective.
+# A preferred shift adds 1, so filling a shift always comes first.
+SHIFT_WEIGHT = 1000
+
+
+def solve(agenda, volunteers, holydays, time_limit=60, seed=0,
+          carried_over_dates=None, carried_over_counters=None,
+          fallback=(), workers=None):
+    """Schedule <volunteers> in the agenda items of <agenda>,
+    after the quarter before with <carried_over_dates> and
+    <carried_over_counters> (see Scheduler).
+    Stop after <time_limit> seconds with the best schedule found.
+    <fallback> has the (name, index of agenda item) of a schedule
+    that keeps the rules. It is the schedule if the solver finds
+    none within <time_limit> (status 'UNKNOWN'), or only a worse one.
+    The search of the solver starts with <seed>. With more than one
+    of the search <workers> (default: the number of cores) 
+    the result can still differ between runs. With one worker
+    <time_limit> is the deterministic time of the solver (about
+    seconds of work, more on a slow computer), so the same seed 
+    gives the same schedule.
+    The persons of each agenda item are set to
+    [caretaker name, generalist name], with "" for a shift
+    that could not be scheduled.
+    Return the status name of the solver (e.g. 'OPTIMAL' or 'FEASIBLE').
+    """
+    if cp_model is None:
+        raise ModuleNotFoundError(
+            'Voor deze planner is OR-Tools nodig: pip install ortools')
+
+    model = cp_model.CpModel()
+    weeknrs = list(agenda.week_positions)
+    slot_of_service = {'verzorger': 0, 'algemeen': 1}
+    check = rules.RuleCheck(agenda, volunteers, holydays, carried_over_dates,
+                            carried_over_counters)
+
+    # x[name, index] is 1 if the person is scheduled
+    # in agenda.items[index].
+    x = {}
+    weights = {}
+    for person in volunteers.persons:
+        for index, ag_item in enumerate(agenda.items):
+            if not check.available(person.name, index):
+                continue
+            var = model.NewBoolVar(f'x[{person.name},{index}]')
+            x[person.name, index] = var
+            weight = SHIFT_WEIGHT
+            if ag_item.shift in person.preferred_shifts.get(
+                    ag_item.weekday, ()):
+                weight += 1
+            weights[person.name, index] = weight
+
+    # One caretaker and one generalist per shift
+    for index in range(len(agenda.items)):
+        for service, persons in volunteers.persons_by_service.items():
+            model.AddAtMostOne(
+                x[name, index] for name in persons
+                if (name, index) in x)
+
+    # Per week position the indexes of the agenda items
+    # from monday to friday and in the weekend
+    in_week = {(position, weekend): [] for position in range(len(weeknrs))
+               for weekend in (False, True)}
+    for index, ag_item in enumerate(agenda.items):
+        in_week[check.week_of[index], check.weekend[index]].append(index)
+
+    def variables(person, indexes):
+        """Return the variables of <person> in the agenda items
+        of <indexes>.
+        """
+        keys = ((person.name, index) for index in indexes)
+        return [x[key] for key in keys if key in x]
+
+    def in_weeks(person, positions, weekend):
+        return [var for position in positions
+                for var in variables(person, in_week[position, weekend])]
+
+    dates = list(agenda.items_by_date.keys())
+
+    for person in volunteers.persons:
+        # Not more than one shift per day and not two days in a row
+        for date in dates:
+            day_and_next_day = (
+                agenda.items_on_date(date)
+                + agenda.items_on_date(date + timedelta(days=1)))
+            model.AddAtMostOne(variables(
+                person, map(agenda.index_of, day_and_next_day)))
+
+        # Not more than two shifts in a week
+        for position in range(len(weeknrs)):
+            model.Add(sum(in_weeks(person, [position], False)
+                          + in_weeks(person, [position], True))
+                      <= rules.MAX_SHIFTS_IN_WEEK)
+
+        # shifts_per_weeks, from monday to friday
+        for window in rules.weekday_windows(weeknrs,
+                                            person.shifts_per_weeks):
+            model.Add(sum(in_weeks(person, window, False))
+                      <= person.shifts_per_weeks.shifts)
+        for position in range(len(weeknrs)):
+            model.Add(sum(in_weeks(person, [position], False))
+                      <= check.weekday_limit(person.name, position))
+
+        # One weekend per WEEKENDCOUNTER weeks
+        for window in rules.weekend_windows(weeknrs, person.name):
+            model.AddAtMostOne(in_weeks(person, window, True))
+
+    model.Maximize(sum(weight * x[key] for key, weight in weights.items()))
+
+    solver = cp_model.CpSolver()
+    solver.parameters.random_seed = seed
+    if workers == 1:
+        # The same search each run: stop on the work done,
+        # not on the clock
+        solver.parameters.num_workers = 1
+        solver.parameters.max_deterministic_time = time_limit
+    else:
+        if workers:
+            solver.parameters.num_workers = workers
+        solver.parameters.max_time_in_seconds = time_limit
+    status = solver.Solve(model)
+    fallback = set(fallback) & weights.keys()
+    fallback_value = sum(weights[key] for key in fallback)
+    if (status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+            and solver.ObjectiveValue() >= fallback_value):
+        def scheduled(key):
+            return solver.Value(x[key])
+    elif status in (cp_model.FEASIBLE, cp_model.UNKNOWN):
+        # No schedule within time_limit, or a worse one
+        def scheduled(key):
+            return key in fallback
+    else:
+        raise exceptions.SolverError(
+            f'Geen planning gevonden binnen {time_limit} seconden '
+            f'(status: {solver.StatusName(status)})')
+
+    for index, ag_item in enumerate(agenda.items):
+        ag_item.persons = ["", ""]
+        for service, persons in volunteers.persons_by_service.items():
+            for name in persons:
+                if (name, index) in x and scheduled((name, index)):
+                    ag_item.persons[slot_of_service[service]] = name
+    return solver.StatusName(status)
@@ -1,252 +1,291 @@
-from collections import Counter
+"""Statistics of the availability of the volunteers.
+All statistics are derived from one AvailabilityMatrix with
+array operations, so they stay fast for thousands of volunteers
+and for what-if variants (see AvailabilityMatrix.subset()).
+
+The results are per service, with the persons numbered 1, 2, ...
+in the order of the persons of that service.
+"""
+import numpy as np
+
 import const
 import init_volunteers
 
 SERVICES = ('algemeen', 'verzorger')
+WEEKDAYS = 7
+SHIFTS = 4
+# 7 x 4 = 28 shifts in a week.
+SHIFTS_IN_WEEK = WEEKDAYS * SHIFTS
+SHIFTS_PER_WEEKS_VARIANTS = ((1, 1), (2, 1), (1, 2), (3, 2), (2, 3))
 
 
-def invert_not_on_shifts_per_weekday(all_persons):
-    """Get the inverse, so on_shifts_per_weekday
+class AvailabilityMatrix:
+    """The availability of persons as arrays, a row per person.
+
+    Attributes:
+        names: (np.ndarray)
+            Person names.
+        services: (np.ndarray)
+            Service of each person.
+        not_on: (np.ndarray)
+            bool, persons x 7 weekdays x 4 shifts. True if the person
+            is not willing to work on the weekday (monday = 0) and shift
+            (shift 1 = 0), see Person.not_on_shifts_per_weekday.
+        shifts_per_weeks: (np.ndarray)
+            int, persons x 2: shifts, per_weeks.
+        weight: (np.ndarray)
+            float, shifts / per_weeks of each person.
     """
-    prs_on_shift_per_weekday_per_service = {}
-    weekdaysrange = (1,2,3,4,5,6,7)
-    #weekdaysrange = (6,7)
-    shiftrange = (1,2,3,4)
+    def __init__(self, persons):
+        self.names = np.array([p.name for p in persons], dtype=object)
+        self.services = np.array([p.service for p in persons], dtype=object)
+        self.not_on = np.zeros((len(persons), WEEKDAYS, SHIFTS), dtype=bool)
+        cells = [(row, weekday - 1, shift - 1)
+                 for row, p in enumerate(persons)
+                 for weekday, shifts in p.not_on_shifts_per_weekday.items()
+                 for shift in shifts]
+        if cells:
+            self.not_on[tuple(np.array(cells).T)] = True
+        self.shifts_per_weeks = np.array(
+            [(p.shifts_per_weeks.shifts, p.shifts_per_weeks.per_weeks)
+             for p in persons], dtype=int).reshape(-1, 2)
+        self.weight = self.shifts_per_weeks[:, 0] / self.shifts_per_weeks[:, 1]
+
+    def __len__(self):
+        return len(self.names)
+
+    def service_mask(self, service):
+        """Return the bool array of the persons with <service>.
+        """
+        return self.services == service
+
+    def subset(self, mask):
+        """Return a new AvailabilityMatrix with the persons in <mask>
+        (a bool array or an array of rows), e.g. without some persons
+        or with the persons of one service.
+        """
+        matrix = AvailabilityMatrix([])
+        matrix.names = self.names[mask]
+        matrix.services = self.services[mask]
+        matrix.not_on = self.not_on[mask]
+        matrix.shifts_per_weeks = self.shifts_per_weeks[mask]
+        matrix.weight = self.weight[mask]
+        return matrix
+
+    def without(self, names):
+        """Return a new AvailabilityMatrix without the persons <names>.
+        """
+        return self.subset(~np.isin(self.names, list(names)))
+
+    def not_on_count(self):
+        """Return the number of shifts per week that each person
+        is not willing to work.
+        """
+        return self.not_on.sum(axis=(1, 2))
+
+    def capacity(self):
+        """Return the planning capacity of each person:
+        ((28 - s) / 28) * (1 / 28) * weight.
+        1/28 is the planningcapacity that a person has
+        if she is available the whole week.
+        The weight indicates shifts_per_weeks.
+        If a person does not work on 7 shifts per week (s = 7), then the
+        planningcapacity = (28-7)/28 = 21/28 = 3/4 of 1/28 * weight.
+        """
+        return (((SHIFTS_IN_WEEK - self.not_on_count()) / SHIFTS_IN_WEEK)
+                * (1 / SHIFTS_IN_WEEK) * self.weight)
+
+    def collisions(self):
+        """Return for each person the sum, over the shifts the person
+        is not willing to work, of the number of persons (of all services)
+        who are not willing to work on that shift either.
+        """
+        count_of_day_and_shift = self.not_on.sum(axis=0)
+        return (self.not_on * count_of_day_and_shift).sum(axis=(1, 2))
+
+    def supply_per_shift(self):
+        """Return a 7 x 4 array with the expected number of persons per
+        week on each weekday and shift, if each person spreads
+        the shifts per week (weight) evenly over the shifts
+        the person is willing to work.
+        """
+        available = ~self.not_on
+        available_count = available.sum(axis=(1, 2))
+        share = np.divide(self.weight, available_count,
+                          out=np.zeros(len(self)),
+                          where=available_count > 0)
+        return (available * share[:, None, None]).sum(axis=0)
+
+
+def _per_service(matrix, values):
+    """Return <values>, an array with a value per person, as a dict
+    key=service, value = dict of key=(int) id, value = value.
+    """
+    result = {}
     for service in SERVICES:
-        persons = [ prs for prs in all_persons if prs.service == service ]
-        prs_on_shift_per_weekday = {}
-        for person in persons:
-            if person.name == 'Inge Beltman':
-                a = person.not_on_shifts_per_weekday
-                pass
-            inverse = {}
-            # For convenient reading set shifts_per_weeks on key: day 0
-            inverse[0] = tuple(person.shifts_per_weeks)
-            weekday_and_shifts = {}
-            for weekday, shifts in person.not_on_shifts_per_weekday.items():
-                weekday_and_shifts[weekday] = shifts
-            for d in weekdaysrange:
-                if d not in weekday_and_shifts.keys():
-                    inverse[d] = (1,2,3,4)
-                else:
-                    prs_shifts = []
-                    for s in shiftrange:
-                        if not s in weekday_and_shifts[d]:
-                            prs_shifts.append(s)
-                    if prs_shifts:
-                        inverse[d] = tuple(prs_shifts)
-                prs_on_shift_per_weekday[person.name] = inverse
-        prs_on_shift_per_weekday_per_service[service] = prs_on_shift_per_weekday 
-    return prs_on_shift_per_weekday_per_service
-
-
-def verzorgers_in_weekend(all_persons):
-    verzorgers = []
-    for prs in all_persons:
-        if prs.service == 'verzorger':
-            a = prs.not_on_shifts_per_weekday.items()
-            for weekday, shifts in prs.not_on_shifts_per_weekday.items():
-                if weekday not in (6,7):
-                    verzorgers.append(prs)
-    return verzorgers
-    
-
-def whoswho(all_persons):
-    """Wich id belongs to wich name?
+        service_values = values[matrix.service_mask(service)]
+        result[service] = {id + 1: value
+                           for id, value in enumerate(service_values.tolist())}
+    return result
+
+
+def invert_not_on_shifts_per_weekday(matrix):
+    """Get the inverse, so on_shifts_per_weekday.
+    Return a dict of key=service, value = dict of key=name,
+    value = dict of key=(int) weekday, value = tuple of shifts.
+    For convenient reading, key 0 has the shifts_per_weeks.
+    A weekday without shifts is left out.
     """
-    id_name_per_service = {}
+    result = {}
     for service in SERVICES:
-        id_name = {}
-        for id, prs in enumerate(prs for prs in all_persons
-                              if prs.service == service):
-            id_name[id+1] = prs.name
-        id_name_per_service[service] = id_name
-    return id_name_per_service
-
-def count_collisions(not_on_spwd_pp_per_service):
-    """For each service, for each person, 
+        persons = matrix.subset(matrix.service_mask(service))
+        available = ~persons.not_on
+        inverse_per_person = {}
+        for row, name in enumerate(persons.names):
+            inverse = {0: tuple(persons.shifts_per_weeks[row].tolist())}
+            for weekday, shifts in enumerate(available[row], 1):
+                if shifts.any():
+                    inverse[weekday] = tuple(
+                        (np.flatnonzero(shifts) + 1).tolist())
+            inverse_per_person[name] = inverse
+        result[service] = inverse_per_person
+    return result
+
+
+def verzorgers_in_weekend(matrix):
+    """Return the names of the caretakers who are willing to work
+    on at least one shift in the weekend, each name once.
+    Note: this used to return the Person objects, once for each
+    weekday from monday to friday in not_on_shifts_per_weekday;
+    the matrix has no Person objects, and the report only prints them.
+    """
+    in_weekend = (~matrix.not_on[:, 5:, :]).any(axis=(1, 2))
+    return tuple(matrix.names[
+        matrix.service_mask('verzorger') & in_weekend].tolist())
+
+
+def whoswho(matrix):
+    """Wich id belongs to wich name?
+    """
+    return _per_service(matrix, matrix.names)
+
+
+def count_collisions(matrix):
+    """For each service, for each person,
     register the day_and_shift collision.
     A day and shift is e.g. ('do', 2).
     If a person doesn't work on the shift
-    AND there are others also for the same shift, 
+    AND there are others also for the same shift,
     the number of collisions is calculated.
     """
-    # Make a list of all items 'not_in_spw_pp'.
-    # Example [ ('ma',1), ('ma',2), ('ma',1) ...]
-    list_ = []
-    for service in SERVICES:
-        for id in not_on_spwd_pp_per_service[service]:
-            list_.extend(not_on_spwd_pp_per_service[service][id])
-    # Make a dict with key=(day,shift) and value= count of the day_and_shift
-    count_of_day_and_shift = Counter(list_)
-        
-    # For each person, register the collision count for each day_and_shift
-    # of that person.
-    collisions_per_service = {}
-    for service in SERVICES:
-        collisions = {}
-        for id in not_on_spwd_pp_per_service[service]:
-            collisions[id] = 0 # initialise the counter
-            for day_and_shift in not_on_spwd_pp_per_service[service][id]:
-                count = count_of_day_and_shift[day_and_shift]
-                collisions[id] += count
-        collisions_per_service[service] = collisions
-    return collisions_per_service
+    return _per_service(matrix, matrix.collisions())
 
 
-def shifts_per_weeks_per_person(all_persons):
+def shifts_per_weeks_per_person(matrix):
     """Report per shift per pserson the type of shifts_per_weeks. """
-    
-    shifts_per_weeks_per_service = {}
-    for service in SERVICES:
-        shifts_per_weeks = {}
-        for id, prs in enumerate(prs for prs in all_persons
-                              if prs.service == service):
-            # Make a tuple for each person
-            shifts_per_weeks[id+1] = (prs.shifts_per_weeks.shifts, prs.shifts_per_weeks.per_weeks)
-        # Add the dict to the 'service' key
-        shifts_per_weeks_per_service[service] = shifts_per_weeks
-    return shifts_per_weeks_per_service 
-
-
-def count_per_shifts_per_weeks(all_persons):
-    """Report how many persons of each service type 
-    have a shifts_per_weeks variant. """
+    values = np.empty(len(matrix), dtype=object)
+    values[:] = [tuple(row) for row in matrix.shifts_per_weeks.tolist()]
+    return _per_service(matrix, values)
+
 
-    caretakers = [ p for p in all_persons if p.service == 'verzorger']
-    generalist = [ p for p in all_persons if p.service == 'algemeen']
-    caretaker_counts = {}
-    generalist_counts = {}
-    spw_variants = ((1,1),(2,1),(1,2),(3,2),(2,3))
-    for shifts, weeks in spw_variants:
-        caretaker_counts['('+str(shifts)+','+str(weeks)+')'] = len(
-            [p for p in caretakers 
-             if p.shifts_per_weeks.shifts == shifts
-             and p.shifts_per_weeks.per_weeks == weeks
-            ])
-        generalist_counts['('+str(shifts)+','+str(weeks)+')'] = len(
-            [p for p in generalist 
-             if p.shifts_per_weeks.shifts == shifts
-             and p.shifts_per_weeks.per_weeks == weeks
-            ])
+def count_per_shifts_per_weeks(matrix):
+    """Report how many persons of each service type
+    have a shifts_per_weeks variant. """
     weight = {}
-    weight['verzorger'] = caretaker_counts
-    weight['algemeen'] = generalist_counts
+    for service in ('verzorger', 'algemeen'):
+        shifts_per_weeks = matrix.shifts_per_weeks[
+            matrix.service_mask(service)]
+        weight[service] = {
+            f'({shifts},{weeks})': int(np.count_nonzero(
+                (shifts_per_weeks == (shifts, weeks)).all(axis=1)))
+            for shifts, weeks in SHIFTS_PER_WEEKS_VARIANTS}
     return weight
 
 
-def not_on_shifts_per_weekday_pp(all_persons):
+def not_on_shifts_per_weekday_pp(matrix):
     """Get data not_in_shifts_per_weekday for each person.
     Result: dict of prs-id, tuple with tuples vor each weekday, shift.
-    Example: verzorger: { 1: (('ma',1), ('ma',2)), 2: (('ma',1), ('vr',4)) }"""
-    
-    not_in_spwd_pp_per_service = {}
-    for service in SERVICES:
-        not_in_spw_pp = {}
-        for id, prs in enumerate(prs for prs in all_persons
-                              if prs.service == service):
-            list_ = []
-            for weekday, shifts in prs.not_on_shifts_per_weekday.items():
-                for shift in shifts:
-                    list_.append((const.WEEKDAY_NAME_LOOKUP[weekday], shift))
-            not_in_spw_pp[id+1] = tuple(list_)
-        not_in_spwd_pp_per_service[service] = not_in_spw_pp
-    return not_in_spwd_pp_per_service
-
-
-def not_in_shifts_count_per_person(all_persons):
+    Example: verzorger: { 1: (('ma',1), ('ma',2)), 2: (('ma',1), ('vr',4)) }
+    The tuples are sorted on weekday and shift. Note: they used to be
+    in the order of not_on_shifts_per_weekday (of the sourcefile).
+    """
+    rows, weekdays, shifts = np.nonzero(matrix.not_on)
+    day_and_shifts = [() for _ in range(len(matrix))]
+    # np.nonzero() returns the cells sorted on row
+    bounds = np.searchsorted(rows, np.arange(len(matrix) + 1))
+    for row in range(len(matrix)):
+        start, end = bounds[row], bounds[row + 1]
+        day_and_shifts[row] = tuple(
+            (const.WEEKDAY_NAME_LOOKUP[weekday + 1], shift + 1)
+            for weekday, shift in zip(weekdays[start:end].tolist(),
+                                      shifts[start:end].tolist()))
+    values = np.empty(len(matrix), dtype=object)
+    values[:] = day_and_shifts
+    return _per_service(matrix, values)
+
+
+def not_in_shifts_count_per_person(matrix):
     """Sum the count_of_not_in_shifts for each person"""
-    
-    count = {}
-    for service in SERVICES:
-        innercount = {}
-        for id, prs in enumerate(prs for prs in all_persons
-                              if prs.service == service):
-            length = 0
-            for shifts in prs.not_on_shifts_per_weekday.values():
-                length += len(shifts)
-            # 7 x 4 = 28 shifts in a week.
-            # Do for each person 28 -/- count of shifts
-            # so we can have like 20/28 as an indication
-            # of the persons capacity for the planning.
-            innercount[id + 1] = length
-            
-            """innercount now has 's' of the numerator of the first term
-            in the formula: ((28-s)/28) * (1/28) * weight.
-            Explanation:
-            1/28 is the planningcapacity that a person has 
-            if she is available the whole week.
-            The weight indicates shifts_per_weeks.
-            If a person does not work on 7 shifts per week, then the
-            planningcapacity = (28-7)/28 = 21/28 = 3/4 of 1/28 * weight.
-            If a person does not work on 0 shifts per week, then the
-            planningcapacity = (28-0)/28 = 28/28 = 1 of 1/28 * weight.
-            """
-        count[service] = innercount
-    return count
-
-
-def capacity_with_shifts(not_in_shift_pp, shifts_per_weeks_per_service_per_person):
-    capacity_pp_per_service = {}
-    for service in SERVICES:
-        capaciteit_totaal = 0
-        for (k1, v1), (k2, v2) in zip(not_in_shift_pp[service].items(), 
-                                      shifts_per_weeks_per_service_per_person[service].items()):
-            #print(k1, '->', v1)
-            #print(k2, '->', v2)
-            capaciteit_pp = ((28 - v1) / 28) * (1/28) * (v2[0] / v2[1])
-            capaciteit_totaal += capaciteit_pp
-        capacity_pp_per_service[service] = capaciteit_totaal
-    return capacity_pp_per_service
+    return _per_service(matrix, matrix.not_on_count())
+
+
+def capacity_with_shifts(matrix):
+    """Return the total planning capacity per service,
+    see AvailabilityMatrix.capacity().
+    """
+    capacity = matrix.capacity()
+    return {service: float(capacity[matrix.service_mask(service)].sum())
+            for service in SERVICES}
 
 
 if __name__ == '__main__':
     input_filename = "vrijwilligers-2023-kw2.csv"
     volunteers = init_volunteers.Volunteers(input_filename)
+    matrix = AvailabilityMatrix(volunteers.persons)
     print()
-    
-    #weight = count_per_shifts_per_weeks(volunteers.persons)
+
+    #weight = count_per_shifts_per_weeks(matrix)
     #print(f'gewicht: aantal verzorgers: {weight["verzorger"]}')
     #print(f'gewicht: aantal algemenen: {weight["algemeen"]}')
     #print()
     #
-    #not_in_shift_pp = not_in_shifts_count_per_person(volunteers.persons)
+    #not_in_shift_pp = not_in_shifts_count_per_person(matrix)
     #print(f'persoon: aantal NIET in shifts, verzorgers: {not_in_shift_pp["verzorger"]}')
     #print(f'persoon: aantal NIET in shifts, algemenen: {not_in_shift_pp["algemeen"]}')
     #print()
     #
-    #shifts_per_weeks_per_service_per_person  = shifts_per_weeks_per_person(volunteers.persons)
+    #shifts_per_weeks_per_service_per_person  = shifts_per_weeks_per_person(matrix)
     #print(f'persoon: gewicht, verzorgers: {shifts_per_weeks_per_service_per_person["verzorger"]}')
     #print(f'persoon: gewicht, algemenen: {shifts_per_weeks_per_service_per_person["algemeen"]}')
     #print()
 
-    #cap_with_shifts = capacity_with_shifts(not_in_shift_pp, shifts_per_weeks_per_service_per_person)
+    #cap_with_shifts = capacity_with_shifts(matrix)
     #print(f'capaciteit_totaal verzorgers: {cap_with_shifts["verzorger"]}')
     #print(f'capaciteit_totaal algemenen: {cap_with_shifts["algemeen"]}')
     #
-    #not_on_spwd_pp_per_service = not_on_shifts_per_weekday_pp(volunteers.persons)
-    #print() 
+    #not_on_spwd_pp_per_service = not_on_shifts_per_weekday_pp(matrix)
+    #print()
     #print(f'persoon: spwd, verzorgers: {not_on_spwd_pp_per_service["verzorger"]}')
-    #print() 
+    #print()
     #print(f'persoon: spwd, algemenen: {not_on_spwd_pp_per_service["algemeen"]}')
     #
-    #collission_count = count_collisions(not_on_spwd_pp_per_service)
-    #print() 
+    #collission_count = count_collisions(matrix)
+    #print()
     #print(f'persoon: aantal botsingen, verzorgers: {collission_count["verzorger"]}')
-    #print() 
+    #print()
     #print(f'persoon: aantal botsingen, algemenen: {collission_count["algemeen"]}')
-    #  
-    #id_to_name = whoswho(volunteers.persons)
-    #print() 
+    #
+    #id_to_name = whoswho(matrix)
+    #print()
     #print(f'verzorgers: {id_to_name["verzorger"]}')
-    #print() 
+    #print()
     #print(f'algemenen: {id_to_name["algemeen"]}')
     #
-    #verzorgers = verzorgers_in_weekend(volunteers.persons)
+    #verzorgers = verzorgers_in_weekend(matrix)
     #print()
-    #print(verzorgers)
+    #print(f'verzorgers in het weekend: {", ".join(verzorgers)}')
 
-    inospw = invert_not_on_shifts_per_weekday(volunteers.persons)
+    inospw = invert_not_on_shifts_per_weekday(matrix)
     with open('inverse.txt', 'w') as f:
         for service in inospw.keys():
             f.write('\n' + service.upper() + '\n')
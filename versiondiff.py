@@ -0,0 +1,165 @@
+"""Compare two versions of a schedule, e.g. 'v. 1' and 'v. 2'
+of a quarter, and report only what changed:
+per shift the old and the new volunteer, and per volunteer
+the shifts that were added, removed or moved.
+
+The shifts are matched on (date, shift), so the comparison
+takes one pass over each agenda.
+
+Example:
+    python versiondiff.py "hospice 2e kwartaal 2023 v. 1.planning" \\
+        "hospice 2e kwartaal 2023 v. 2.planning"
+"""
+import argparse
+from collections import namedtuple
+from pathlib import Path
+
+import const
+import init_agenda
+import snapshot
+
+SERVICE_OF_SLOT = ('verzorger', 'algemeen')
+
+# A shift with another volunteer.
+#   date: date_object, shift: (int)
+#   service: (string) 'verzorger' or 'algemeen'
+#   old, new: (string) person name, "" if the shift has no volunteer
+ShiftChange = namedtuple('ShiftChange', (
+    'date', 'shift', 'service', 'old', 'new'))
+
+# The changed shifts of a volunteer, each shift as (date, shift).
+#   added: shifts only in the new version
+#   removed: shifts only in the old version
+#   moved: (old shift, new shift) of a removed and an added shift
+PersonChange = namedtuple('PersonChange', (
+    'name', 'added', 'removed', 'moved'))
+
+
+def assignments(agenda):
+    """Return the persons of the items of <agenda>, as a dict
+    key=(date, shift), value = (caretaker name, generalist name).
+    """
+    return {(ag_item.date, ag_item.shift): tuple(ag_item.persons)
+            for ag_item in agenda.items}
+
+
+def load_assignments(filename):
+    """Return the assignments() of the schedule saved in <filename>
+    (see snapshot.py) and the Snapshot.
+    """
+    saved = snapshot.load(filename)
+    agenda = init_agenda.Agenda(year=saved.year, quarter=saved.quarter)
+    for ag_item, caretaker, generalist in zip(
+            agenda.items, saved.caretakers, saved.generalists):
+        ag_item.persons = [caretaker, generalist]
+    return assignments(agenda), saved
+
+
+def diff_shifts(old, new):
+    """Return a list of ShiftChange for each shift in the
+    assignments <old> and <new> with another volunteer.
+    A shift that is in only one of the two counts as a shift
+    without a volunteer in the other.
+    """
+    changes = []
+    empty = ("", "")
+    # The order of <old>, then the shifts that are only in <new>
+    keys = list(old) + [key for key in new if key not in old]
+    for key in keys:
+        old_persons = old.get(key, empty)
+        new_persons = new.get(key, empty)
+        if old_persons == new_persons:
+            continue
+        for slot, service in enumerate(SERVICE_OF_SLOT):
+            if old_persons[slot] != new_persons[slot]:
+                changes.append(ShiftChange(
+                    key[0], key[1], service,
+                    old_persons[slot], new_persons[slot]))
+    return changes
+
+
+def diff_persons(shift_changes):
+    """Return a list of PersonChange, one for each volunteer
+    in <shift_changes> (see diff_shifts()), sorted on name.
+    A removed and an added shift of a volunteer are paired
+    in the order of the shifts into a moved shift.
+    """
+    added = {}
+    removed = {}
+    for change in shift_changes:
+        key = (change.date, change.shift)
+        if change.old:
+            removed.setdefault(change.old, []).append(key)
+        if change.new:
+            added.setdefault(change.new, []).append(key)
+    result = []
+    for name in sorted(added.keys() | removed.keys()):
+        person_added = added.get(name, [])
+        person_removed = removed.get(name, [])
+        moved = min(len(person_added), len(person_removed))
+        result.append(PersonChange(
+            name,
+            added=tuple(person_added[moved:]),
+            removed=tuple(person_removed[moved:]),
+            moved=tuple(zip(person_removed[:moved], person_added[:moved]))))
+    return result
+
+
+def shift_label(key):
+    """Return the (date, shift) <key> as e.g. 'ma 03-04-2023 7-11 uur'.
+    """
+    date, shift = key
+    return (f'{const.WEEKDAY_NAME_LOOKUP[date.isoweekday()]} '
+            f'{date.strftime(const.DATEFORMAT)} '
+            f'{const.SHIFTNUMBER_LABEL_LOOKUP[shift]}')
+
+
+def report_lines(shift_changes, person_changes):
+    """Yield the lines of the report of the changes.
+    """
+    if not shift_changes:
+        yield 'Geen verschillen.'
+        return
+    yield f'Per dienst ({len(shift_changes)} gewijzigd):'
+    for change in shift_changes:
+        label = shift_label((change.date, change.shift))
+        yield (f'  {label:26} {change.service:10} '
+               f'{change.old or "#N/A"} -> {change.new or "#N/A"}')
+    yield ''
+    yield f'Per vrijwilliger ({len(person_changes)} gewijzigd):'
+    for person in person_changes:
+        yield f'  {person.name}'
+        for old_key, new_key in person.moved:
+            yield (f'    verplaatst: {shift_label(old_key)} -> '
+                   f'{shift_label(new_key)}')
+        for key in person.added:
+            yield f'    erbij:      {shift_label(key)}'
+        for key in person.removed:
+            yield f'    eraf:       {shift_label(key)}'
+
+
+def main(args):
+    old, old_saved = load_assignments(args.old)
+    new, new_saved = load_assignments(args.new)
+    shift_changes = diff_shifts(old, new)
+    lines = [f'Verschillen tussen versie {old_saved.version} '
+             f'({old_saved.quarter}e kwartaal {old_saved.year}) '
+             f'en versie {new_saved.version} '
+             f'({new_saved.quarter}e kwartaal {new_saved.year})', '']
+    lines.extend(report_lines(shift_changes, diff_persons(shift_changes)))
+    text = '\n'.join(lines) + '\n'
+    if args.output:
+        Path(args.output).write_text(text, encoding='UTF-8')
+        print(f'Bestand opgeslagen: {args.output}')
+    else:
+        print(text, end='')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Verschillen tussen twee versies van een planning')
+    parser.add_argument('old', help='.planning bestand van de oude versie')
+    parser.add_argument('new', help='.planning bestand van de nieuwe versie')
+    parser.add_argument('-o', '--output',
+        help='.txt bestand voor het verslag (standaard: scherm)')
+    main(parser.parse_args())